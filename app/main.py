@@ -1,8 +1,18 @@
 import uvicorn
 import os
+import asyncio
+import importlib
 from fastapi import FastAPI
-from app.routes import instagram_routes, tiktok_routes
+from app.routes import instagram_routes, tiktok_routes, media_routes, system_routes, watch_routes
+from app.services.watch_service import watcher
 from app.utils.playwright_utils import playwright_manager
+from app.utils.http_session import close_sessions
+from app.utils.request_context import request_state
+from app.utils.scheduler import resolve_tenant, resolve_priority
+from app.utils.memory import start_profiling, track_route
+from app.utils.text_analytics import close_pool
+from app.utils.deadline import DeadlineMiddleware
+from app.utils.admission import admit
 from dotenv import load_dotenv
 import logging
 
@@ -12,21 +22,82 @@ logger = logging.getLogger(__name__)
 # Load environment variables from a .env file
 load_dotenv()
 
+# eager: launch the browser before serving (default)
+# background: start serving right away and launch the browser in the background
+# lazy: launch the browser on the first request that needs a page
+BROWSER_STARTUP = os.getenv("BROWSER_STARTUP", "eager").lower()
+
 app = FastAPI()
 
 # Include Instagram and TikTok routes
 app.include_router(instagram_routes.router)
 app.include_router(tiktok_routes.router)
+app.include_router(media_routes.router)
+app.include_router(system_routes.router)
+app.include_router(watch_routes.router)
+
+background_tasks = set()
+
+@app.middleware("http")
+async def request_context_middleware(request, call_next):
+    state = {
+        "tenant": resolve_tenant(request.headers.get("x-tenant"), request.headers.get("x-api-key")),
+        # Bulk endpoints are all POSTs and always run as batch work
+        "priority": resolve_priority(request.headers.get("x-priority"), "batch" if request.method == "POST" else "interactive"),
+    }
+    token = request_state.set(state)
+    try:
+        with track_route(request.url.path):
+            response = await call_next(request)
+    finally:
+        request_state.reset(token)
+    if state.get("stale"):
+        # Served from the last good answer because the upstream is blocking us
+        response.headers["Warning"] = '110 - "Response is Stale"'
+        response.headers["X-Stale-Reason"] = state["stale"]
+    if state.get("sources"):
+        # Which upstream answered: "graphql", "embed" or both for bulk requests
+        response.headers["X-Data-Source"] = ",".join(sorted(state["sources"]))
+    return response
+
+# Registered after the context middleware so it runs first: shed load before doing any work
+app.middleware("http")(admit)
+
+# Outermost, so the deadline covers the whole request and disconnects cancel everything below
+app.add_middleware(DeadlineMiddleware)
+
+async def warm_up_browser():
+    try:
+        # Import off the event loop so requests aren't stalled while the module loads
+        await asyncio.to_thread(importlib.import_module, "playwright.async_api")
+        await playwright_manager.initialize()
+        logger.info("Playwright initialized in background")
+    except Exception as e:
+        # A later get_page() will retry the launch
+        logger.error(f"Background Playwright initialization failed: {str(e)}")
 
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Initializing Playwright...")
-    await playwright_manager.initialize()
+    start_profiling()
+    watcher.start()
+    if BROWSER_STARTUP == "lazy":
+        logger.info("Playwright will be initialized on first use")
+    elif BROWSER_STARTUP == "background":
+        logger.info("Initializing Playwright in background...")
+        task = asyncio.create_task(warm_up_browser())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+    else:
+        logger.info("Initializing Playwright...")
+        await playwright_manager.initialize()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await watcher.stop()
     logger.info("Closing Playwright...")
     await playwright_manager.close()
+    await close_sessions()
+    close_pool()
 
 # import asyncio
 # import json
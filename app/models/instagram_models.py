@@ -0,0 +1,138 @@
+import json
+from json.encoder import encode_basestring
+
+# Marks an optional field that was never set; it is left out of the output
+MISSING = object()
+
+# Same settings FastAPI's JSONResponse uses, so output stays byte-for-byte identical
+dumps = json.JSONEncoder(ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode
+
+class Model:
+    """Slotted result object that encodes straight to JSON without an intermediate dict.
+
+    Fields are written in __slots__ order, which is the order of the keys on the wire.
+    """
+    __slots__ = ()
+    json_keys = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.json_keys = tuple(encode_basestring(field) + ":" for field in cls.__slots__)
+
+    def __init__(self, **fields):
+        for field in self.__slots__:
+            setattr(self, field, fields.get(field, MISSING))
+
+    def encode_into(self, parts):
+        opening = "{"
+        for key, field in zip(self.json_keys, self.__slots__):
+            value = getattr(self, field)
+            if value is MISSING:
+                continue
+            parts.append(opening)
+            parts.append(key)
+            opening = ","
+            encode_value(value, parts)
+        parts.append("{}" if opening == "{" else "}")
+
+    def to_json_bytes(self):
+        parts = []
+        self.encode_into(parts)
+        return "".join(parts).encode("utf-8")
+
+    def to_dict(self):
+        return {
+            field: to_plain(getattr(self, field))
+            for field in self.__slots__
+            if getattr(self, field) is not MISSING
+        }
+
+def encode_value(value, parts):
+    if isinstance(value, str):
+        parts.append(encode_basestring(value))
+    elif value is None:
+        parts.append("null")
+    elif value is True:
+        parts.append("true")
+    elif value is False:
+        parts.append("false")
+    elif isinstance(value, Model):
+        value.encode_into(parts)
+    elif isinstance(value, list):
+        if not value:
+            parts.append("[]")
+            return
+        parts.append("[")
+        for index, item in enumerate(value):
+            if index:
+                parts.append(",")
+            encode_value(item, parts)
+        parts.append("]")
+    elif type(value) is int:
+        parts.append(int.__repr__(value))
+    else:
+        parts.append(dumps(value))
+
+def to_plain(value):
+    if isinstance(value, Model):
+        return value.to_dict()
+    if isinstance(value, list):
+        return [to_plain(item) for item in value]
+    return value
+
+class TaggedUser(Model):
+    __slots__ = ("original_id", "name", "username", "profile_picture", "is_verified")
+
+class CarouselStatistics(Model):
+    __slots__ = ("view_count", "play_count")
+
+class CarouselItem(Model):
+    __slots__ = ("original_id", "shortcode", "display_url", "is_video", "media_kind", "uri", "tagged_users", "statistics")
+
+class CommentOwner(Model):
+    __slots__ = ("original_id", "username", "profile_picture")
+
+class ChildComment(Model):
+    __slots__ = ("original_id", "timestamp", "text", "like_count", "owner", "tags")
+
+class Comment(Model):
+    __slots__ = ("original_id", "timestamp", "text", "like_count", "child_comment_count", "owner", "child_comments", "tags")
+
+class Location(Model):
+    __slots__ = ("original_id", "has_public_page", "name", "slug", "address_json")
+
+class AudioInfo(Model):
+    __slots__ = ("artist_name", "song_name", "uses_original_audio", "audio_id")
+
+class Tags(Model):
+    __slots__ = ("hashtags", "account_tags", "urls", "emoji")
+
+class TextAnalytics(Model):
+    __slots__ = ("texts", "hashtags", "mentions", "urls", "emoji")
+
+class PostStatistics(Model):
+    __slots__ = ("like_count", "comment_count", "share_count", "play_count", "views_count", "video_duration")
+
+class StructuredPost(Model):
+    __slots__ = (
+        "original_id", "uri", "shortcode", "timestamp", "display_url", "media_kind", "is_video", "text",
+        "tags", "statistics", "media_carousel", "tagged_users", "comments", "location", "audio_info", "text_analytics",
+    )
+
+class OwnerStatistics(Model):
+    __slots__ = ("follower_count", "media_count")
+
+class Owner(Model):
+    __slots__ = ("original_id", "name", "username", "profile_picture", "is_verified", "is_private", "statistics")
+
+class StructuredData(Model):
+    __slots__ = ("post", "owner", "updated_at")
+
+class CompactPost(Model):
+    __slots__ = ("original_id", "timestamp", "uri", "statistics", "text", "media_kind")
+
+class CompactUser(Model):
+    __slots__ = ("original_id", "name", "username", "statistics")
+
+class CompactData(Model):
+    __slots__ = ("post", "user", "created_at", "updated_at", "engagement_count")
@@ -1,14 +1,29 @@
-from fastapi import APIRouter, Request, HTTPException
-from app.services.instagram_service import fetch_profile_data, extract_shortcode, fetch_post_data, create_compact_data, create_structured_data
+import os
+from typing import List
+from fastapi import APIRouter, Request, HTTPException, Response
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from app.services.instagram_service import fetch_profile_data, extract_shortcode, fetch_post_data, fetch_post_statistics, fetch_bulk_post_statistics, compact_model, structured_model, add_text_analytics, COMPACT_PROJECTION
+from app.services.export_service import export_posts, export_file_path
 
 router = APIRouter()
 
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 1000))
+
+class ShortcodesRequest(BaseModel):
+    shortcodes: List[str]
+
+class ExportRequest(BaseModel):
+    shortcodes: List[str]
+    format: str = "parquet"
+    responseType: str = "compact"
+
 @router.get("/scrape-instagram-profile")
 async def scrape_instagram_profile(request: Request):
     username = request.query_params.get("username")
     if not username:
         raise HTTPException(status_code=400, detail="Please provide a valid Instagram username.")
-    profile_data = fetch_profile_data(username)
+    profile_data = await fetch_profile_data(username)
     return profile_data
 
 @router.get("/scrape-instagram-post")
@@ -23,14 +38,49 @@ async def scrape_instagram_post(request: Request):
     if not shortcode:
         raise HTTPException(status_code=400, detail="Unable to extract shortcode from URL.")
 
-    post_data = fetch_post_data(shortcode)
+    if response_type == 'statistics':
+        return await fetch_post_statistics(shortcode)
+
+    if response_type == 'compact':
+        # Compact output only reads counts and owner fields: ask for the light query and build just those
+        post_data = await fetch_post_data(shortcode, statistics_only=True, projection=COMPACT_PROJECTION)
+    else:
+        post_data = await fetch_post_data(shortcode)
     media_data = post_data.get("data", {}).get("xdt_shortcode_media", {})
 
+    # Typed models encode straight to JSON, skipping FastAPI's jsonable_encoder walk
     if response_type == 'compact':
-        return create_compact_data(media_data, url)
+        return Response(compact_model(media_data, url).to_json_bytes(), media_type="application/json")
     elif response_type == 'raw':
         return post_data
     elif response_type == 'all':
-        return create_structured_data(media_data, url)
+        data = structured_model(media_data, url)
+        if request.query_params.get("analytics") in ("1", "true"):
+            await add_text_analytics(data)
+        return Response(data.to_json_bytes(), media_type="application/json")
     else:
         return post_data
+
+@router.post("/scrape-instagram-posts/statistics")
+async def scrape_instagram_posts_statistics(body: ShortcodesRequest):
+    if not body.shortcodes:
+        raise HTTPException(status_code=400, detail="Please provide at least one Instagram shortcode.")
+    if len(body.shortcodes) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} shortcodes are allowed per request.")
+    return {"results": await fetch_bulk_post_statistics(body.shortcodes)}
+
+@router.post("/scrape-instagram-posts/export")
+async def export_instagram_posts(body: ExportRequest):
+    if not body.shortcodes:
+        raise HTTPException(status_code=400, detail="Please provide at least one Instagram shortcode.")
+    if len(body.shortcodes) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} shortcodes are allowed per request.")
+    if body.responseType not in ("compact", "all"):
+        raise HTTPException(status_code=400, detail="responseType must be 'compact' or 'all'.")
+    return await export_posts(body.shortcodes, body.format, body.responseType)
+
+@router.get("/scrape-instagram-posts/export")
+async def download_instagram_export(request: Request):
+    file_format = request.query_params.get("format", "parquet")
+    path = export_file_path(request.query_params.get("id"), request.query_params.get("table"), file_format)
+    return FileResponse(path, media_type="application/vnd.apache.parquet" if file_format == "parquet" else "application/vnd.apache.arrow.file")
@@ -0,0 +1,47 @@
+import re
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from app.services.media_service import stream_media
+
+router = APIRouter()
+
+SHORTCODE_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+TIKTOK_ID_PATTERN = re.compile(r'^\d+$')
+
+def media_index(request):
+    try:
+        index = int(request.query_params.get("index", 0))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="index must be an integer.")
+    if index < 0:
+        raise HTTPException(status_code=400, detail="index must not be negative.")
+    return index
+
+async def media_response(request, platform, content_id):
+    status, headers, body, cleanup = await stream_media(
+        platform, content_id, media_index(request), request.headers.get("range")
+    )
+    if request.query_params.get("download"):
+        headers["Content-Disposition"] = f'attachment; filename="{platform}_{content_id}"'
+    return StreamingResponse(
+        body,
+        status_code=status,
+        headers=headers,
+        media_type=headers.get("Content-Type"),
+        background=BackgroundTask(cleanup) if cleanup else None,
+    )
+
+@router.get("/media/instagram")
+async def instagram_media(request: Request):
+    shortcode = request.query_params.get("shortcode")
+    if not shortcode or not SHORTCODE_PATTERN.match(shortcode):
+        raise HTTPException(status_code=400, detail="Please provide a valid Instagram shortcode.")
+    return await media_response(request, "instagram", shortcode)
+
+@router.get("/media/tiktok")
+async def tiktok_media(request: Request):
+    content_id = request.query_params.get("id")
+    if not content_id or not TIKTOK_ID_PATTERN.match(content_id):
+        raise HTTPException(status_code=400, detail="Please provide a valid TikTok content id.")
+    return await media_response(request, "tiktok", content_id)
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Request, HTTPException, Query
+from app.utils.playwright_utils import playwright_manager, cache_stats
+from app.utils.hedging import hedge_stats
+from app.utils.circuit_breaker import breaker_stats
+from app.utils.scheduler import scheduler_stats
+from app.utils.retry import retry_stats
+from app.utils.negative_cache import negative_cache_stats
+from app.utils.admission import admission_stats
+from app.utils.memory import sampler, allocation_report
+from app.services.watch_service import watcher
+import tracemalloc
+
+router = APIRouter()
+
+@router.get("/health")
+async def health():
+    return {
+        "status": "ok",
+        "browser": "running" if playwright_manager.is_running else "idle",
+    }
+
+@router.get("/metrics")
+async def metrics():
+    return {
+        "hedging": hedge_stats(),
+        "circuits": breaker_stats(),
+        "admission": admission_stats(),
+        "scheduler": scheduler_stats(),
+        "retries": retry_stats(),
+        "negative_cache": negative_cache_stats(),
+        "memory": sampler.snapshot(),
+        "watch": watcher.snapshot(),
+        "browser_cache": cache_stats.snapshot(),
+    }
+
+@router.get("/debug/memory")
+async def debug_memory(request: Request, top: int = Query(10, ge=1, le=100)):
+    if not tracemalloc.is_tracing():
+        raise HTTPException(status_code=404, detail="Memory profiling is disabled. Set MEMORY_PROFILING=1 to enable it.")
+    diff = request.query_params.get("diff") in ("1", "true")
+    group_by = "traceback" if request.query_params.get("traceback") in ("1", "true") else "lineno"
+    return allocation_report(top, diff, group_by)
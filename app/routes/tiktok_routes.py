@@ -1,12 +1,20 @@
+import os
 import logging
+from typing import List
 from fastapi import APIRouter, Request, HTTPException
-from app.services.tiktok_service import get_tiktok_data, fetch_tiktok_api_data, get_tiktok_api_data, get_tiktok_playwright
+from pydantic import BaseModel
+from app.services.tiktok_service import get_tiktok_data, fetch_tiktok_api_data, fetch_tiktok_api_data_bulk, get_tiktok_api_data, get_tiktok_playwright, load_tokens
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+BULK_MAX_ITEMS = int(os.getenv("BULK_MAX_ITEMS", 1000))
+
+class ContentIdsRequest(BaseModel):
+    ids: List[str]
+
 @router.get("/scrape-tiktok")
 async def scrape_tiktok(request: Request):
     url = request.query_params.get("url")
@@ -16,12 +24,13 @@ async def scrape_tiktok(request: Request):
     try:
         ms_token, username, final_url, x_bogus, content_id, content_type = await get_tiktok_data(url)
 
-        if all([ms_token, username, x_bogus, content_id]):
+        # The item is fetched by its id alone; links like /@/video/<id> carry no username
+        if all([ms_token, x_bogus, content_id]):
             if content_type == 'photo':
-                logger.info(f"Fetching TikTok photo data for {username}...")
+                logger.info(f"Fetching TikTok photo data for {username or content_id}...")
                 tiktok_data = await fetch_tiktok_api_data(content_id, x_bogus)
             else:
-                logger.info(f"Fetching TikTok video data for {username}...")
+                logger.info(f"Fetching TikTok video data for {username or content_id}...")
                 tiktok_data = await get_tiktok_playwright(final_url)
                 # tiktok_data = await get_tiktok_api_data(ms_token, username, final_url, content_id, content_type)
 
@@ -31,5 +40,19 @@ async def scrape_tiktok(request: Request):
                 raise HTTPException(status_code=400, detail="Failed to fetch TikTok data.")
         else:
             raise HTTPException(status_code=400, detail="Failed to retrieve all necessary data for TikTok scraping.")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+@router.post("/scrape-tiktok/bulk")
+async def scrape_tiktok_bulk(body: ContentIdsRequest):
+    if not body.ids:
+        raise HTTPException(status_code=400, detail="Please provide at least one TikTok content id.")
+    if len(body.ids) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_MAX_ITEMS} ids are allowed per request.")
+    if not all(content_id.isdigit() for content_id in body.ids):
+        raise HTTPException(status_code=400, detail="TikTok content ids must be numeric.")
+
+    _, x_bogus, _ = load_tokens()
+    return {"results": await fetch_tiktok_api_data_bulk(body.ids, x_bogus)}
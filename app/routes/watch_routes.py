@@ -0,0 +1,46 @@
+from typing import List, Optional
+from fastapi import APIRouter, Request, HTTPException
+from pydantic import BaseModel
+from app.services.watch_service import watcher, TARGET_TYPES
+
+router = APIRouter()
+
+class WatchTarget(BaseModel):
+    type: str
+    id: str
+    interval: Optional[float] = None
+
+class WatchRequest(BaseModel):
+    targets: List[WatchTarget]
+
+@router.get("/watch")
+async def list_watch_targets():
+    return {"targets": [target.to_dict() for target in watcher.targets.values()]}
+
+@router.post("/watch")
+async def add_watch_targets(body: WatchRequest):
+    if not body.targets:
+        raise HTTPException(status_code=400, detail="Please provide at least one watch target.")
+    for target in body.targets:
+        if target.type not in TARGET_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unknown watch target type '{target.type}'. Use one of: {', '.join(TARGET_TYPES)}.")
+    added = [watcher.add(target.type, target.id, target.interval).to_dict() for target in body.targets]
+    watcher.save()
+    return {"targets": added}
+
+@router.delete("/watch")
+async def remove_watch_target(request: Request):
+    target_type = request.query_params.get("type")
+    target_id = request.query_params.get("id")
+    if not watcher.remove(target_type, target_id):
+        raise HTTPException(status_code=404, detail="Watch target not found.")
+    watcher.save()
+    return {"removed": {"type": target_type, "id": target_id}}
+
+@router.get("/watch/changes")
+async def watch_changes(request: Request):
+    try:
+        since = int(request.query_params.get("since", 0))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="'since' must be an integer sequence number.")
+    return {"last_seq": watcher.sequence, "changes": watcher.changes_since(since)}
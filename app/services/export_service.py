@@ -0,0 +1,434 @@
+from app.services.instagram_service import fetch_post_data, compact_model, structured_model, add_text_analytics_batch, text_nodes, COMPACT_PROJECTION
+from app.models.instagram_models import MISSING
+from app.utils.retry import start_retry_scope
+from app.utils.request_context import item_source
+from app.utils.text_analytics import TEXT_ANALYTICS_POOL_THRESHOLD
+from fastapi import HTTPException
+import os
+import re
+import time
+import uuid
+import shutil
+import asyncio
+import logging
+import datetime
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+EXPORT_CONCURRENCY = int(os.getenv("EXPORT_CONCURRENCY", 8))
+# Finished exports are deleted once older than EXPORT_TTL seconds or beyond the newest
+# EXPORT_MAX_COUNT; 0 disables the corresponding limit
+EXPORT_TTL = float(os.getenv("EXPORT_TTL", 24 * 3600))
+EXPORT_MAX_COUNT = int(os.getenv("EXPORT_MAX_COUNT", 100))
+
+EXPORT_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+EXPORT_TABLES = ("posts", "owners", "comments", "carousel_items")
+EXPORT_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+# Exports still being written; the sweep leaves them alone
+active_exports = set()
+
+def import_pyarrow():
+    # pyarrow is optional; only the export endpoints need it
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Columnar export requires the optional 'pyarrow' package.")
+
+def table_schemas(pa, response_type):
+    timestamp = pa.timestamp("s", tz="UTC")
+    statistics = [
+        ("like_count", pa.int64()),
+        ("comment_count", pa.int64()),
+        ("share_count", pa.int64()),
+        ("play_count", pa.int64()),
+        ("views_count", pa.int64()),
+    ]
+    owners = pa.schema([
+        ("original_id", pa.string()),
+        ("username", pa.string()),
+        ("name", pa.string()),
+        ("profile_picture", pa.string()),
+        ("is_verified", pa.bool_()),
+        ("is_private", pa.bool_()),
+        ("follower_count", pa.int64()),
+        ("media_count", pa.int64()),
+    ])
+    if response_type == "compact":
+        return {
+            "posts": pa.schema([
+                ("shortcode", pa.string()),
+                ("source", pa.string()),
+                ("original_id", pa.string()),
+                ("uri", pa.string()),
+                ("timestamp", timestamp),
+                ("text", pa.string()),
+                ("media_kind", pa.string()),
+                *statistics,
+                ("engagement_count", pa.int64()),
+                ("owner_id", pa.string()),
+                ("updated_at", pa.timestamp("us")),
+            ]),
+            "owners": owners,
+        }
+    return {
+        "posts": pa.schema([
+            ("shortcode", pa.string()),
+            ("source", pa.string()),
+            ("original_id", pa.string()),
+            ("uri", pa.string()),
+            ("timestamp", timestamp),
+            ("display_url", pa.string()),
+            ("media_kind", pa.string()),
+            ("is_video", pa.bool_()),
+            ("text", pa.string()),
+            ("hashtags", pa.list_(pa.string())),
+            ("account_tags", pa.list_(pa.string())),
+            ("urls", pa.list_(pa.string())),
+            ("emoji_count", pa.int64()),
+            *statistics,
+            ("video_duration", pa.float64()),
+            ("location_id", pa.string()),
+            ("location_name", pa.string()),
+            ("audio_id", pa.string()),
+            ("owner_id", pa.string()),
+            ("updated_at", pa.timestamp("us")),
+        ]),
+        "owners": owners,
+        "comments": pa.schema([
+            ("shortcode", pa.string()),
+            ("original_id", pa.string()),
+            ("parent_id", pa.string()),
+            ("timestamp", timestamp),
+            ("text", pa.string()),
+            ("like_count", pa.int64()),
+            ("child_comment_count", pa.int64()),
+            ("hashtags", pa.list_(pa.string())),
+            ("mentions", pa.list_(pa.string())),
+            ("urls", pa.list_(pa.string())),
+            ("emoji_count", pa.int64()),
+            ("owner_id", pa.string()),
+            ("owner_username", pa.string()),
+        ]),
+        "carousel_items": pa.schema([
+            ("shortcode", pa.string()),
+            ("position", pa.int32()),
+            ("original_id", pa.string()),
+            ("item_shortcode", pa.string()),
+            ("display_url", pa.string()),
+            ("is_video", pa.bool_()),
+            ("media_kind", pa.string()),
+            ("uri", pa.string()),
+            ("view_count", pa.int64()),
+            ("play_count", pa.int64()),
+        ]),
+    }
+
+def field(model, name):
+    value = getattr(model, name, None) if model is not None and model is not MISSING else None
+    return None if value is MISSING else value
+
+def parse_time(value):
+    # Models carry ISO strings ("...Z" for upstream timestamps); columns store real timestamps
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value[:-1] + "+00:00" if value.endswith("Z") else value)
+
+def statistics_row(statistics):
+    return {name: field(statistics, name) for name in ("like_count", "comment_count", "share_count", "play_count", "views_count")}
+
+def owner_row(owner):
+    statistics = field(owner, "statistics")
+    return {
+        "original_id": field(owner, "original_id"),
+        "username": field(owner, "username"),
+        "name": field(owner, "name"),
+        "profile_picture": field(owner, "profile_picture"),
+        "is_verified": field(owner, "is_verified"),
+        "is_private": field(owner, "is_private"),
+        "follower_count": field(statistics, "follower_count"),
+        "media_count": field(statistics, "media_count"),
+    }
+
+def compact_rows(shortcode, data, source=None):
+    post, user = data.post, data.user
+    yield "posts", {
+        "shortcode": shortcode,
+        "source": source,
+        "original_id": post.original_id,
+        "uri": post.uri,
+        "timestamp": parse_time(post.timestamp),
+        "text": post.text,
+        "media_kind": post.media_kind,
+        **statistics_row(post.statistics),
+        "engagement_count": data.engagement_count,
+        "owner_id": user.original_id,
+        "updated_at": parse_time(data.updated_at),
+    }
+    yield "owners", owner_row(user)
+
+def structured_rows(shortcode, data, source=None):
+    post, owner = data.post, data.owner
+    location, audio = field(post, "location"), field(post, "audio_info")
+    yield "posts", {
+        "shortcode": shortcode,
+        "source": source,
+        "original_id": post.original_id,
+        "uri": post.uri,
+        "timestamp": parse_time(post.timestamp),
+        "display_url": post.display_url,
+        "media_kind": post.media_kind,
+        "is_video": post.is_video,
+        "text": post.text,
+        "hashtags": post.tags.hashtags,
+        "account_tags": post.tags.account_tags,
+        "urls": post.tags.urls,
+        "emoji_count": sum(post.tags.emoji.values()),
+        **statistics_row(post.statistics),
+        "video_duration": field(post.statistics, "video_duration"),
+        "location_id": field(location, "original_id"),
+        "location_name": field(location, "name"),
+        "audio_id": field(audio, "audio_id"),
+        "owner_id": owner.original_id,
+        "updated_at": parse_time(data.updated_at),
+    }
+    yield "owners", owner_row(owner)
+
+    for comment in post.comments:
+        replies = field(comment, "child_comments") or []
+        for parent_id, node in [(None, comment)] + [(comment.original_id, reply) for reply in replies]:
+            tags = node.tags
+            yield "comments", {
+                "shortcode": shortcode,
+                "original_id": node.original_id,
+                "parent_id": parent_id,
+                "timestamp": parse_time(node.timestamp),
+                "text": node.text,
+                "like_count": node.like_count,
+                "child_comment_count": field(node, "child_comment_count"),
+                "hashtags": tags.hashtags,
+                "mentions": tags.account_tags,
+                "urls": tags.urls,
+                "emoji_count": sum(tags.emoji.values()),
+                "owner_id": field(node.owner, "original_id"),
+                "owner_username": field(node.owner, "username"),
+            }
+
+    for position, item in enumerate(post.media_carousel):
+        statistics = field(item, "statistics")
+        yield "carousel_items", {
+            "shortcode": shortcode,
+            "position": position,
+            "original_id": item.original_id,
+            "item_shortcode": item.shortcode,
+            "display_url": item.display_url,
+            "is_video": item.is_video,
+            "media_kind": item.media_kind,
+            "uri": item.uri,
+            "view_count": field(statistics, "view_count"),
+            "play_count": field(statistics, "play_count"),
+        }
+
+class TableWriter:
+    """Buffers rows for one table and appends them to the file a record batch at a time."""
+
+    def __init__(self, pa, path, schema, file_format, batch_size):
+        self.pa = pa
+        self.path = path
+        self.schema = schema
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.rows = []
+        self.row_count = 0
+        self.writer = None
+
+    def open(self):
+        if self.file_format == "parquet":
+            self.writer = self.pa.parquet.ParquetWriter(self.path, self.schema)
+        else:
+            self.sink = self.pa.OSFile(self.path, "wb")
+            self.writer = self.pa.ipc.new_file(self.sink, self.schema)
+
+    def write(self, rows):
+        if self.writer is None:
+            self.open()
+        if not rows:
+            return
+        columns = [[row.get(name) for row in rows] for name in self.schema.names]
+        batch = self.pa.RecordBatch.from_arrays(
+            [self.pa.array(values, type=column.type) for values, column in zip(columns, self.schema)],
+            schema=self.schema,
+        )
+        if self.file_format == "parquet":
+            self.writer.write_table(self.pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+        self.row_count += len(rows)
+
+    def close(self):
+        # Always leave a file behind, even if it only carries the schema
+        if self.writer is None:
+            self.open()
+        self.writer.close()
+        if self.file_format != "parquet":
+            self.sink.close()
+
+class ColumnarExport:
+    def __init__(self, file_format, response_type, batch_size=EXPORT_BATCH_SIZE):
+        self.pa = import_pyarrow()
+        self.id = uuid.uuid4().hex
+        self.directory = os.path.join(EXPORT_DIR, self.id)
+        os.makedirs(self.directory, exist_ok=True)
+        self.response_type = response_type
+        self.batch_size = batch_size
+        self.seen_owners = set()
+        # Structured posts wait here so their texts go through one analyze_batch call
+        self.analytics_pending = []
+        self.analytics_texts = 0
+        extension = EXPORT_FORMATS[file_format]
+        self.tables = {
+            name: TableWriter(self.pa, os.path.join(self.directory, name + extension), schema, file_format, batch_size)
+            for name, schema in table_schemas(self.pa, response_type).items()
+        }
+
+    async def add(self, shortcode, media_data, source=None):
+        url = f"https://www.instagram.com/p/{shortcode}/"
+        if self.response_type == "compact":
+            await self.write_rows(shortcode, compact_rows(shortcode, compact_model(media_data, url), source))
+            return
+        data = structured_model(media_data, url)
+        self.analytics_pending.append((shortcode, data, source))
+        self.analytics_texts += len(text_nodes(data.post))
+        # One post is under a hundred texts; batching across posts is what lets big exports reach the process pool
+        if self.analytics_texts >= TEXT_ANALYTICS_POOL_THRESHOLD or len(self.analytics_pending) >= self.batch_size:
+            await self.flush_analytics()
+
+    async def flush_analytics(self):
+        pending, self.analytics_pending, self.analytics_texts = self.analytics_pending, [], 0
+        if not pending:
+            return
+        await add_text_analytics_batch([data for _, data, _ in pending])
+        for shortcode, data, source in pending:
+            await self.write_rows(shortcode, structured_rows(shortcode, data, source))
+
+    async def write_rows(self, shortcode, rows):
+        for table, row in rows:
+            if table == "owners":
+                # An owner is written once per export, however many of their posts are in it.
+                # Without an id there is nothing to match on, so the row stays with its post.
+                key = row["original_id"] or ("post", shortcode)
+                if key in self.seen_owners:
+                    continue
+                self.seen_owners.add(key)
+            writer = self.tables[table]
+            writer.rows.append(row)
+            if len(writer.rows) >= self.batch_size:
+                await self.flush(writer)
+
+    async def flush(self, writer):
+        rows, writer.rows = writer.rows, []
+        await asyncio.to_thread(writer.write, rows)
+
+    async def close(self):
+        await self.flush_analytics()
+        for writer in self.tables.values():
+            await self.flush(writer)
+            await asyncio.to_thread(writer.close)
+
+    def manifest(self):
+        return {
+            "id": self.id,
+            # Relative to EXPORT_DIR so the server's filesystem layout doesn't leak to clients
+            "tables": {name: {"rows": writer.row_count, "path": os.path.relpath(writer.path, EXPORT_DIR)}
+                       for name, writer in self.tables.items()},
+        }
+
+async def export_posts(shortcodes, file_format="parquet", response_type="compact", concurrency=EXPORT_CONCURRENCY):
+    if file_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format '{file_format}'. Use one of: {', '.join(EXPORT_FORMATS)}.")
+    await asyncio.to_thread(sweep_exports)
+    export = ColumnarExport(file_format, response_type)
+    active_exports.add(export.id)
+
+    # Workers hand results over through a queue no deeper than the worker count, so only a
+    # handful of media dicts wait while the writer converts rows
+    pending = iter(shortcodes)
+    results = asyncio.Queue(maxsize=concurrency)
+    errors = []
+
+    async def worker():
+        for shortcode in pending:
+            start_retry_scope()
+            try:
+                if response_type == "compact":
+                    # Same light query and projection as the compact route
+                    post_data = await fetch_post_data(shortcode, statistics_only=True, projection=COMPACT_PROJECTION)
+                else:
+                    post_data = await fetch_post_data(shortcode)
+                media_data = post_data.get("data", {}).get("xdt_shortcode_media")
+                if not media_data:
+                    raise HTTPException(status_code=404, detail=f"Post {shortcode} not found.")
+                await results.put((shortcode, media_data, item_source.get()))
+            except Exception as e:
+                logger.error(f"Export failed for {shortcode}: {str(e)}")
+                errors.append({"shortcode": shortcode, "error": getattr(e, "detail", None) or str(e)})
+        await results.put(None)
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        finished = 0
+        while finished < len(workers):
+            item = await results.get()
+            if item is None:
+                finished += 1
+                continue
+            await export.add(*item)
+    finally:
+        for task in workers:
+            task.cancel()
+        try:
+            await export.close()
+        finally:
+            active_exports.discard(export.id)
+
+    return {**export.manifest(), "errors": errors}
+
+def sweep_exports(now=None):
+    """Delete finished exports past EXPORT_TTL or beyond the newest EXPORT_MAX_COUNT."""
+    try:
+        names = os.listdir(EXPORT_DIR)
+    except OSError:
+        return 0
+    exports = []
+    for name in names:
+        if not EXPORT_ID_PATTERN.match(name) or name in active_exports:
+            continue
+        try:
+            exports.append((os.path.getmtime(os.path.join(EXPORT_DIR, name)), name))
+        except OSError:
+            continue
+    exports.sort(reverse=True)
+    now = time.time() if now is None else now
+    removed = 0
+    for index, (modified_at, name) in enumerate(exports):
+        expired = EXPORT_TTL and now - modified_at > EXPORT_TTL
+        surplus = EXPORT_MAX_COUNT and index >= EXPORT_MAX_COUNT
+        if expired or surplus:
+            shutil.rmtree(os.path.join(EXPORT_DIR, name), ignore_errors=True)
+            removed += 1
+    if removed:
+        logger.info(f"Removed {removed} old exports from {EXPORT_DIR}")
+    return removed
+
+def export_file_path(export_id, table, file_format="parquet"):
+    if not EXPORT_ID_PATTERN.match(export_id or "") or table not in EXPORT_TABLES or file_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Invalid export id, table or format.")
+    path = os.path.join(EXPORT_DIR, export_id, table + EXPORT_FORMATS[file_format])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Export file not found.")
+    return path
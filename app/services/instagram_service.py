@@ -1,4 +1,3 @@
-import requests
 import json
 import re
 import os
@@ -6,15 +5,104 @@ import urllib.parse
 import datetime
 import logging
 import asyncio
+import aiohttp
+from html import unescape
 from typing import Dict, Any, Optional
 from app.utils.playwright_utils import get_page, navigate_and_wait
+from app.utils.hedging import hedged_call
+from app.utils.utils import get_proxy_list
+from app.utils.http_session import get_session, request_timeout
+from app.utils.url_classifier import classify_url, needs_resolution, resolve_short_link
+from app.utils.upstreams import upstream_url
+from app.utils.block_detection import instagram_block_reason
+from app.utils.circuit_breaker import (
+    BlockedError, CircuitOpenError, acquire_breaker, available_routes, get_breaker, guarded, remember, stale_or_raise,
+    untried_route,
+)
+from app.utils.negative_cache import TargetUnavailableError, NEGATIVE_CONFIRM_WINDOW, check_unavailable, remember_unavailable
+from app.models.instagram_models import (
+    TaggedUser, CarouselItem, CarouselStatistics, CommentOwner, ChildComment, Comment, Location, AudioInfo,
+    Tags, TextAnalytics, PostStatistics, StructuredPost, OwnerStatistics, Owner, StructuredData, CompactPost, CompactUser, CompactData,
+)
+from app.utils.text_analytics import analyze_batch, summarize
+from app.utils.retry import RetryPolicy, start_retry_scope
+from app.utils.request_context import mark_source, item_source
+from app.utils.json_projection import Projection, STREAMING_PARSE, STREAM_CHUNK_SIZE, read_head, parse_projected
 from fastapi import FastAPI, Request, HTTPException
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def fetch_profile_data(username):
-    url = "https://i.instagram.com/api/v1/users/web_profile_info"
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", 8))
+
+# GraphQL variables for a full post with comments and likers
+POST_VARIABLES = {
+    "parent_comment_count": 24,
+    "child_comment_count": 3,
+    "fetch_like_count": 10,
+    "has_threaded_comments": True
+}
+
+# Smallest payload that still carries the post counters
+STATISTICS_VARIABLES = {
+    "parent_comment_count": 0,
+    "child_comment_count": 0,
+    "fetch_like_count": 0,
+    "has_threaded_comments": False
+}
+
+MEDIA_PREFIX = "data.xdt_shortcode_media"
+
+# Only these subtrees are built when a projected response is parsed incrementally
+COMPACT_PROJECTION = Projection("compact", [f"{MEDIA_PREFIX}.{path}" for path in (
+    "__typename", "id", "taken_at_timestamp", "video_play_count", "video_view_count",
+    "edge_media_preview_like.count", "edge_media_to_parent_comment.count",
+    "edge_media_to_caption.edges.item.node.text",
+    "edge_sidecar_to_children.edges.item.node.__typename",
+    "owner.id", "owner.full_name", "owner.username", "owner.edge_followed_by.count",
+)])
+MEDIA_PROJECTION = Projection("media", [f"{MEDIA_PREFIX}.{path}" for path in (
+    "__typename", "id", "display_url", "video_url", "is_video",
+    "edge_sidecar_to_children.edges.item.node.display_url",
+    "edge_sidecar_to_children.edges.item.node.video_url",
+)])
+STATISTICS_PROJECTION = Projection("statistics", [f"{MEDIA_PREFIX}.{path}" for path in (
+    "id", "shortcode", "taken_at_timestamp", "video_play_count", "video_view_count",
+    "edge_media_preview_like.count", "edge_media_to_parent_comment.count", "edge_media_to_share.count",
+)])
+
+# Transport and decoding failures that count as "this source failed", not as a bug
+UPSTREAM_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError)
+
+HASHTAG_PATTERN = re.compile(r"#\w+")
+MENTION_PATTERN = re.compile(r"@\w+")
+
+# Where post data comes from, tried in order: "graphql" (the INSTAGRAM_DOC_ID query) and
+# "embed" (the public embed page over plain HTTP). "embed,graphql" makes the embed page primary.
+# Results are tagged "graphql", "embed", "embed_markup" (embed page without its JSON) or "stale".
+INSTAGRAM_POST_SOURCES = [
+    source for source in (item.strip() for item in os.getenv("INSTAGRAM_POST_SOURCES", "graphql,embed").split(","))
+    if source in ("graphql", "embed")
+] or ["graphql"]
+
+# The embed page carries the post as escaped JSON, older versions as __additionalDataLoaded
+EMBED_CONTEXT_JSON = re.compile(r'"contextJSON":("(?:[^"\\]|\\.)*")')
+EMBED_EXTRA_DATA = re.compile(r"window\.__additionalDataLoaded\('extra',\s*(\{.*?\})\);</script>", re.S)
+# Rendered markup, for pages without either
+EMBED_USERNAME = re.compile(r'class="UsernameText"[^>]*>([^<]+)<')
+EMBED_IMAGE = re.compile(r'class="EmbeddedMediaImage"[^>]*?\ssrc="([^"]+)"')
+EMBED_CAPTION = re.compile(r'<div class="Caption">(.*?)<div class="CaptionComments">', re.S)
+EMBED_CAPTION_USERNAME = re.compile(r'<a class="CaptionUsername"[^>]*>.*?</a>', re.S)
+# Counts may be abbreviated ("1.2M", "12,5K") or carry thousands separators ("1,234", "1.234")
+EMBED_LIKES = re.compile(r'([\d,.]+)\s*([KkMm]?)\s+likes?\b')
+EMBED_COMMENTS = re.compile(r'View all ([\d,.]+)\s*([KkMm]?) comments')
+EMBED_GROUPED_INTEGER = re.compile(r'\d{1,3}(?:([,.])\d{3})?(?:\1\d{3})*')
+EMBED_SUFFIXES = {"k": 1000, "m": 1000000}
+EMBED_BREAK = re.compile(r'<br\s*/?>')
+EMBED_TAG = re.compile(r'<[^>]+>')
+
+async def fetch_profile_data(username):
+    url = upstream_url("https://i.instagram.com/api/v1/users/web_profile_info")
 
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
@@ -25,70 +113,148 @@ def fetch_profile_data(username):
         "username": username
     }
 
-    proxy = os.getenv('PROXY')
-    proxies = None
-    if proxy:
-        proxies = {
-            "http": proxy,
-            "https": proxy
-        }
+    target = f"instagram_profile:{username}"
+    check_unavailable(target)
 
+    # PROXY stays the primary route, the others are only used for hedging
+    primary = os.getenv('PROXY') or None
+    routes = [primary] + [route for route in [None] + get_proxy_list() if route != primary]
+
+    session = get_session("instagram")
+
+    async def get(proxy):
+        async with session.get(url, headers=headers, params=params, proxy=proxy, timeout=request_timeout()) as response:
+            body = await response.read()
+            raise_if_blocked("instagram_profile", response, body[:4096])
+            if response.status == 404:
+                raise TargetUnavailableError(target, "not_found")
+            response.raise_for_status()
+        data = json.loads(body)
+        if data.get("status") == "ok" and not (data.get("data") or {}).get("user"):
+            raise TargetUnavailableError(target, "not_found")
+        return data
+
+    stale_key = f"instagram_profile:{username}"
     try:
-        response = requests.get(url, headers=headers, params=params, proxies=proxies)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
+        routes = available_routes("instagram_profile", routes)
+        attempt = guarded("instagram_profile", get)
+        return remember(stale_key, await hedged_call("instagram_profile", attempt, routes))
+    except TargetUnavailableError as e:
+        remember_unavailable(e)
+        raise
+    except (BlockedError, CircuitOpenError) as e:
+        return stale_or_raise(stale_key, e)
+    except UPSTREAM_ERRORS as e:
         raise HTTPException(status_code=400, detail=f"An error occurred: {e}")
 
-async def extract_shortcode(url, max_retries=3, delay=5):
+def raise_if_blocked(upstream, response, head, expect_html=False):
+    # Only the start of the body is needed to spot a login wall
+    head = head.decode("utf-8", "ignore")
+    reason = instagram_block_reason(response.status, response.headers.get("Content-Type", ""), head, str(response.url), expect_html)
+    if reason:
+        raise BlockedError(upstream, reason, response.headers.get("Retry-After"))
+
+async def extract_shortcode(url, max_retries=3):
     shortcode = extract_shortcode_from_url(url)
     if shortcode:
         return shortcode
 
-    for attempt in range(max_retries):
-        async with await get_page() as page:
-            try:
+    # Share links usually redirect straight to the post, so try that before a browser
+    if needs_resolution(classify_url(url)):
+        resolved_url = await resolve_short_link(url)
+        shortcode = extract_shortcode_from_url(resolved_url) if resolved_url else None
+        if shortcode:
+            return shortcode
+
+    async def attempt(n):
+        breaker = acquire_breaker("instagram_browser")
+        # The breaker is taken before the page, so a failed page acquisition must release it too
+        try:
+            async with await get_page() as page:
                 await navigate_and_wait(page, url)
                 current_url = page.url
+
+                reason = instagram_block_reason(200, url=current_url)
+                if reason:
+                    raise BlockedError("instagram_browser", reason)
                 
-                shortcode_match = re.search(r'/(?:p|reel)/([^/]+)', current_url)
-                if shortcode_match:
-                    return shortcode_match.group(1)
+                shortcode = extract_shortcode_from_url(current_url)
+                if shortcode:
+                    breaker.record_success()
+                    return shortcode
                 
                 content = await page.content()
                 content_match = re.search(r'"shortcode":"([^"]+)"', content)
                 if content_match:
+                    breaker.record_success()
                     return content_match.group(1)
                 
                 raise ValueError(f"Shortcode not found for URL: {url}")
             
-            except Exception as e:
-                logger.error(f"An error occurred on attempt {attempt + 1}: {str(e)}")
-                if attempt == max_retries - 1:
-                    raise
-                await asyncio.sleep(delay)
-    
-    raise Exception(f"Failed to extract shortcode after {max_retries} attempts")
+        except BlockedError as e:
+            breaker.record_block(e.reason)
+            raise
+        except Exception as e:
+            breaker.release()
+            logger.error(f"An error occurred on attempt {n + 1}: {str(e)}")
+            raise
+        except BaseException:
+            # Cancelled or deadline hit while waiting for a page or mid-navigation
+            breaker.release()
+            raise
+
+    return await RetryPolicy("instagram_browser", max_retries).run(attempt)
 
 def extract_shortcode_from_url(url):
-    if "share" in url:
-        logger.info("URL is a share link, skipping shortcode extraction.")
+    info = classify_url(url)
+    if info is None or info.platform != "instagram" or info.kind not in ("post", "reel"):
+        logger.info(f"No shortcode in URL: {url}")
         return None
-    shortcode_match = re.search(r'/(?:p|reel|reels)/([^/]+)', url)
-    logger.info(f"Extracted shortcode from input URL: {shortcode_match.group(1)}")
-    return shortcode_match.group(1) if shortcode_match else None
+    logger.info(f"Extracted shortcode from input URL: {info.id}")
+    return info.id
+
+async def fetch_post_data(shortcode: str, max_retries: int = 3, statistics_only: bool = False, projection: Optional[Projection] = None) -> Dict:
+    target = f"instagram_post:{shortcode}"
+    check_unavailable(target)
 
-def fetch_post_data(shortcode: str, max_retries: int = 3) -> Dict:
-    url = "https://www.instagram.com/graphql/query/"
+    variant = projection.name if projection else ('statistics' if statistics_only else 'full')
+    stale_key = f"instagram_post:{shortcode}:{variant}"
 
+    item_source.set(None)
+    error = None
+    for source in INSTAGRAM_POST_SOURCES:
+        try:
+            if source == "embed":
+                data = await fetch_embed_post(shortcode, target, max_retries)
+                if "id" not in data["data"]["xdt_shortcode_media"]:
+                    # Only the rendered markup was readable: no id, timestamp or video URL
+                    source = "embed_markup"
+            else:
+                data = await fetch_graphql_post(shortcode, target, max_retries, statistics_only, projection)
+        except TargetUnavailableError as e:
+            remember_unavailable(e)
+            raise
+        except (BlockedError, CircuitOpenError, *UPSTREAM_ERRORS) as e:
+            # Throttled or failing: the next source is a different endpoint with its own limits
+            logger.warning(f"Post source {source} failed for {shortcode}: {getattr(e, 'detail', e)}")
+            error = e
+            continue
+        mark_source(source)
+        return remember(stale_key, data)
+
+    if isinstance(error, UPSTREAM_ERRORS):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Failed to fetch data for {shortcode}: {error}"
+        )
+    return stale_or_raise(stale_key, error)
+
+async def fetch_graphql_post(shortcode, target, max_retries=3, statistics_only=False, projection=None):
+    url = upstream_url("https://www.instagram.com/graphql/query/")
+
+    variables = STATISTICS_VARIABLES if statistics_only else POST_VARIABLES
     payload = {
-        "variables": json.dumps({
-            "shortcode": shortcode,
-            "parent_comment_count": 24,
-            "child_comment_count": 3,
-            "fetch_like_count": 10,
-            "has_threaded_comments": True
-        }),
+        "variables": json.dumps({"shortcode": shortcode, **variables}),
         "doc_id": f"{os.getenv('INSTAGRAM_DOC_ID')}",
     }
 
@@ -101,58 +267,197 @@ def fetch_post_data(shortcode: str, max_retries: int = 3) -> Dict:
         "Content-Type": "application/x-www-form-urlencoded"
     }
 
-    # Dapatkan daftar proxy dari environment variable
-    proxy_list = [
-        os.getenv('PROXY', ''),
-        os.getenv('PROXY_2', ''),
-        os.getenv('PROXY_3', '')
-    ]
-    
-    # Hapus proxy kosong
-    proxy_list = [proxy for proxy in proxy_list if proxy]
+    # Pertama, coba tanpa proxy, lalu gunakan proxy sesuai urutan
+    routes = [None] + get_proxy_list()
+
+    session = get_session("instagram")
+
+    async def post(proxy):
+        async with session.post(url, data=encoded_payload, headers=headers, proxy=proxy, timeout=request_timeout()) as response:
+            if projection and STREAMING_PARSE:
+                # Body is parsed as it arrives and only the projected fields are built
+                chunks = response.content.iter_chunked(STREAM_CHUNK_SIZE)
+                head = await read_head(chunks)
+                raise_if_blocked("instagram_graphql", response, head)
+                response.raise_for_status()
+                return check_media(await parse_projected(head, chunks, projection) or {}, proxy)
+            body = await response.read()
+            raise_if_blocked("instagram_graphql", response, body[:4096])
+            response.raise_for_status()
+        return check_media(json.loads(body), proxy)
 
-    for attempt in range(max_retries):
-        # Pertama, coba tanpa proxy
-        if attempt == 0:
-            proxies = None
-        else:
-            # Gunakan proxy sesuai urutan
-            current_proxy = proxy_list[attempt - 1]
-            proxies = {
-                "http": current_proxy,
-                "https": current_proxy
-            }
+    # Routes that answered "no media" during this call
+    empty_routes = set()
 
-        try:
-            response = requests.post(
-                url, 
-                data=encoded_payload, 
-                headers=headers, 
-                proxies=proxies,
-                timeout=10  # Tambahkan timeout untuk mencegah hanging
-            )
+    def check_media(data, proxy):
+        if (data.get("data") or {}).get("xdt_shortcode_media"):
+            return data
+        # A soft block also answers 200 with no media, so an empty answer only means the post
+        # is gone when a second route agrees or this route is serving other posts fine
+        empty_routes.add(proxy)
+        if data.get("data") is not None and (
+            len(empty_routes) > 1 or get_breaker("instagram_graphql", proxy).recently_healthy(NEGATIVE_CONFIRM_WINDOW)
+        ):
+            raise TargetUnavailableError(target, "not_found")
+        raise BlockedError("instagram_graphql", "empty_media")
+
+    attempt_post = guarded("instagram_graphql", post)
+
+    async def attempt(n):
+        # Route yang sedang diblokir dilewati
+        usable_routes = available_routes("instagram_graphql", routes)
+
+        # Setiap percobaan mulai dari route berikutnya, hedge memakai route sesudahnya
+        offset = n % len(usable_routes)
+        attempt_routes = usable_routes[offset:] + usable_routes[:offset]
+        return await hedged_call("instagram_graphql", attempt_post, attempt_routes)
+
+    # 4xx selain 408/429 tidak diulang; blok hanya dicoba lagi lewat route yang belum dipakai
+    return await RetryPolicy("instagram_graphql", max_retries, retry_blocked=untried_route("instagram_graphql", routes)).run(attempt)
+
+async def fetch_embed_post(shortcode, target, max_retries=3):
+    """Fetch a post from its public embed page, shaped like the GraphQL response."""
+    url = upstream_url(f"https://www.instagram.com/p/{shortcode}/embed/captioned/")
+
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+        "Referer": "https://www.instagram.com/",
+    }
+
+    routes = [None] + get_proxy_list()
+
+    session = get_session("instagram")
+
+    async def get(proxy):
+        async with session.get(url, headers=headers, proxy=proxy, timeout=request_timeout()) as response:
+            body = await response.read()
+            raise_if_blocked("instagram_embed", response, body[:4096], expect_html=True)
+            if response.status == 404:
+                raise TargetUnavailableError(target, "not_found")
             response.raise_for_status()
-            return response.json()
-        
-        except requests.RequestException as e:
-            # Log error atau print untuk debugging
-            print(f"Attempt {attempt + 1} failed: {e}")
-            
-            # Jika ini adalah percobaan terakhir, raise exception
-            if attempt == max_retries - 1:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Failed to fetch data after {max_retries} attempts: {e}"
-                )
-    
-    # Fallback jika semua percobaan gagal
-    raise HTTPException(
-        status_code=500, 
-        detail="Unexpected error in fetch_post_data"
-    )
+        media = parse_embed_page(body.decode(response.charset or "utf-8", "replace"), shortcode)
+        if not media:
+            # The page loaded but carries no post: treat it like GraphQL's empty soft block
+            raise BlockedError("instagram_embed", "empty_media")
+        return {"data": {"xdt_shortcode_media": media}}
+
+    attempt_get = guarded("instagram_embed", get)
 
+    async def attempt(n):
+        usable_routes = available_routes("instagram_embed", routes)
+        offset = n % len(usable_routes)
+        return await hedged_call("instagram_embed", attempt_get, usable_routes[offset:] + usable_routes[:offset])
+
+    return await RetryPolicy("instagram_embed", max_retries, retry_blocked=untried_route("instagram_embed", routes)).run(attempt)
+
+def parse_embed_page(html, shortcode):
+    """Return GraphQL-shaped media data from an embed page, or None when it has no post."""
+    match = EMBED_CONTEXT_JSON.search(html)
+    if match:
+        try:
+            context = json.loads(json.loads(match.group(1)))
+        except ValueError:
+            context = {}
+        media = (context.get("gql_data") or {}).get("shortcode_media")
+        if media:
+            return embed_media(media)
+
+    match = EMBED_EXTRA_DATA.search(html)
+    if match:
+        try:
+            media = json.loads(match.group(1)).get("shortcode_media")
+        except ValueError:
+            media = None
+        if media:
+            return embed_media(media)
+
+    return embed_markup_media(html, shortcode)
+
+def embed_media(media):
+    # The embed payload names some counters differently from the GraphQL query
+    if "edge_media_preview_like" not in media and "edge_liked_by" in media:
+        media["edge_media_preview_like"] = media["edge_liked_by"]
+    if "edge_media_to_parent_comment" not in media and "edge_media_to_comment" in media:
+        media["edge_media_to_parent_comment"] = media["edge_media_to_comment"]
+    return media
+
+def embed_count(pattern, html):
+    """Read a counter from the markup; None when it is shown in a form we can't read exactly."""
+    match = pattern.search(html)
+    if not match:
+        return 0
+    number, suffix = match.group(1), match.group(2).lower()
+    if suffix:
+        # Either separator may be the decimal point, depending on the page locale
+        try:
+            return round(float(number.replace(",", ".")) * EMBED_SUFFIXES[suffix])
+        except ValueError:
+            return None
+    if number.isdigit():
+        return int(number)
+    if EMBED_GROUPED_INTEGER.fullmatch(number):
+        return int(re.sub(r"[,.]", "", number))
+    return None
+
+def embed_markup_media(html, shortcode):
+    """Last resort when the page has no JSON: read what the rendered markup shows."""
+    username = EMBED_USERNAME.search(html)
+    image = EMBED_IMAGE.search(html)
+    if not username and not image:
+        return None
+
+    if "Sidecar" in html:
+        typename = "GraphSidecar"
+    elif "EmbeddedMediaVideo" in html or "VideoPlayer" in html:
+        typename = "GraphVideo"
+    else:
+        typename = "GraphImage"
+
+    media = {
+        "__typename": typename,
+        "shortcode": shortcode,
+        "display_url": unescape(image.group(1)) if image else None,
+        "is_video": typename == "GraphVideo",
+        "edge_media_preview_like": {"count": embed_count(EMBED_LIKES, html)},
+        "edge_media_to_parent_comment": {"count": embed_count(EMBED_COMMENTS, html)},
+        "owner": {"username": unescape(username.group(1)).strip() if username else None},
+    }
+    caption = EMBED_CAPTION.search(html)
+    if caption:
+        text = EMBED_CAPTION_USERNAME.sub("", caption.group(1))
+        text = unescape(EMBED_TAG.sub("", EMBED_BREAK.sub("\n", text))).strip()
+        if text:
+            media["edge_media_to_caption"] = {"edges": [{"node": {"text": text}}]}
+    return media
+
+async def fetch_post_statistics(shortcode: str) -> Dict:
+    post_data = await fetch_post_data(shortcode, statistics_only=True, projection=STATISTICS_PROJECTION)
+    media_data = post_data.get("data", {}).get("xdt_shortcode_media")
+    if not media_data:
+        raise HTTPException(status_code=404, detail=f"Post {shortcode} not found.")
+    return create_statistics_data(media_data)
+
+async def fetch_bulk_post_statistics(shortcodes, concurrency: int = BULK_CONCURRENCY):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(shortcode):
+        start_retry_scope()
+        async with semaphore:
+            try:
+                data = await fetch_post_statistics(shortcode)
+                return {"shortcode": shortcode, "source": item_source.get(), "data": data}
+            except HTTPException as e:
+                return {"shortcode": shortcode, "error": e.detail}
+            except Exception as e:
+                logger.error(f"Failed to fetch statistics for {shortcode}: {str(e)}")
+                return {"shortcode": shortcode, "error": str(e)}
+
+    return await asyncio.gather(*(fetch_one(shortcode) for shortcode in shortcodes))
 
 def convert_timestamp_to_iso(timestamp):
+    # The embed page markup has no timestamp
+    if timestamp is None:
+        return None
     dt = datetime.datetime.utcfromtimestamp(timestamp)
     return dt.isoformat() + 'Z'
 
@@ -189,13 +494,13 @@ def tagged_users(media_data):
     tagged_users = []
     for tagged_user in media_data.get("edge_media_to_tagged_user", {}).get("edges", []):
         user = tagged_user.get("node", {}).get("user", {})
-        tagged_users.append({
-            "original_id": user.get("id"),
-            "name": user.get("full_name"),
-            "username": user.get("username"),
-            "profile_picture": user.get("profile_pic_url"),
-            "is_verified": user.get("is_verified"),
-        })
+        tagged_users.append(TaggedUser(
+            original_id=user.get("id"),
+            name=user.get("full_name"),
+            username=user.get("username"),
+            profile_picture=user.get("profile_pic_url"),
+            is_verified=user.get("is_verified"),
+        ))
     return tagged_users
 
 def media_kind_carousel(typename):
@@ -207,9 +512,9 @@ def media_kind_carousel(typename):
         return "unknown"
 
 def extract_tags_from_text(text):
-    # Regular expression to find all hashtags and account tags in the text
-    hashtags = re.findall(r"(#\w+)", text)
-    account_tags = re.findall(r"(@\w+)", text)
+    # Default output keeps counting tags that appear inside links; the analytics stage doesn't
+    hashtags = HASHTAG_PATTERN.findall(text)
+    account_tags = MENTION_PATTERN.findall(text)
     return {
         "hashtags": hashtags,
         "account_tags": account_tags
@@ -219,63 +524,62 @@ def media_carousel(media_data):
     media_carousel = []
     for media in media_data.get("edge_sidecar_to_children", {}).get("edges", []):
         node = media.get("node", {})
-        carousel_item = {
-            "original_id": node.get("id"),
-            "shortcode": node.get("shortcode"),
-            "display_url": node.get("display_url"),
-            "is_video": node.get("is_video"),
-            "media_kind": media_kind_carousel(node.get("__typename")),
-            "uri": node.get("video_url") or node.get("display_url"),
-            "tagged_users": tagged_users(node),
-        }
+        carousel_item = CarouselItem(
+            original_id=node.get("id"),
+            shortcode=node.get("shortcode"),
+            display_url=node.get("display_url"),
+            is_video=node.get("is_video"),
+            media_kind=media_kind_carousel(node.get("__typename")),
+            uri=node.get("video_url") or node.get("display_url"),
+            tagged_users=tagged_users(node),
+        )
         
         # Menambahkan statistik khusus untuk video
         if node.get("is_video"):
-            carousel_item["statistics"] = {
-                "view_count": node.get("video_view_count"),
-                "play_count": node.get("video_play_count"),
-            }
+            carousel_item.statistics = CarouselStatistics(
+                view_count=node.get("video_view_count"),
+                play_count=node.get("video_play_count"),
+            )
         
         media_carousel.append(carousel_item)
     
     return media_carousel
 
+def comment_owner(node):
+    owner = node.get("owner", {})
+    return CommentOwner(
+        original_id=owner.get("id"),
+        username=owner.get("username"),
+        profile_picture=owner.get("profile_pic_url"),
+    )
+
 def comments_data(media_data):
     def child_comment_count(comment):
         child_comments = []
         for edge in comment.get("edge_threaded_comments", {}).get("edges", []):
             node = edge.get("node", {})
-            child_comments.append({
-                "original_id": node.get("id"),
-                "timestamp": convert_timestamp_to_iso(node.get("created_at")),
-                "text": node.get("text"),
-                "like_count": node.get("edge_liked_by", {}).get("count", 0),
-                "owner": {
-                    "original_id": node.get("owner", {}).get("id"),
-                    "username": node.get("owner", {}).get("username"),
-                    "profile_picture": node.get("owner", {}).get("profile_pic_url"),
-                }
-            })
+            child_comments.append(ChildComment(
+                original_id=node.get("id"),
+                timestamp=convert_timestamp_to_iso(node.get("created_at")),
+                text=node.get("text"),
+                like_count=node.get("edge_liked_by", {}).get("count", 0),
+                owner=comment_owner(node),
+            ))
         return child_comments
 
     def process_comments(edges):
         comments_data = []
         for edge in edges:
             node = edge.get("node", {})
-            comment = {
-                "original_id": node.get("id"),
-                "timestamp": convert_timestamp_to_iso(node.get("created_at")),
-                "text": node.get("text"),
-                "like_count": node.get("edge_liked_by", {}).get("count", 0),
-                "child_comment_count": node.get("edge_threaded_comments", {}).get("count", 0),
-                "owner": {
-                    "original_id": node.get("owner", {}).get("id"),
-                    "username": node.get("owner", {}).get("username"),
-                    "profile_picture": node.get("owner", {}).get("profile_pic_url"),
-                },
-                "child_comments": child_comment_count(node),
-            }
-            comments_data.append(comment)
+            comments_data.append(Comment(
+                original_id=node.get("id"),
+                timestamp=convert_timestamp_to_iso(node.get("created_at")),
+                text=node.get("text"),
+                like_count=node.get("edge_liked_by", {}).get("count", 0),
+                child_comment_count=node.get("edge_threaded_comments", {}).get("count", 0),
+                owner=comment_owner(node),
+                child_comments=child_comment_count(node),
+            ))
         return comments_data
 
     # Check if media_data is a list (edges) or a dictionary
@@ -295,107 +599,155 @@ def comments_data(media_data):
 
 def location_data(location):
     data = location.get("location", {})
-    return {
-        "original_id": data.get("id"),
-        "has_public_page": data.get("has_public_page"),
-        "name": data.get("name"),
-        "slug": data.get("slug"),
-        "address_json": data.get("address_json"),
-    }
+    return Location(
+        original_id=data.get("id"),
+        has_public_page=data.get("has_public_page"),
+        name=data.get("name"),
+        slug=data.get("slug"),
+        address_json=data.get("address_json"),
+    )
 
 def audio_info(media_data):
     audio_data = media_data.get("clips_music_attribution_info", {})
+    return AudioInfo(
+        artist_name=audio_data.get("artist_name"),
+        song_name=audio_data.get("song_name"),
+        uses_original_audio=audio_data.get("uses_original_audio"),
+        audio_id=audio_data.get("audio_id"),
+    )
+
+def create_statistics_data(media_data):
     return {
-        "artist_name": audio_data.get("artist_name"),
-        "song_name": audio_data.get("song_name"),
-        "uses_original_audio": audio_data.get("uses_original_audio"),
-        "audio_id": audio_data.get("audio_id"),
+        "original_id": media_data.get("id"),
+        "shortcode": media_data.get("shortcode"),
+        "timestamp": convert_timestamp_to_iso(media_data.get("taken_at_timestamp")),
+        "statistics": {
+            "like_count": media_data.get("edge_media_preview_like", {}).get("count", 0),
+            "comment_count": media_data.get("edge_media_to_parent_comment", {}).get("count", 0),
+            "share_count": media_data.get("edge_media_to_share", {}).get("count", 0),
+            "play_count": media_data.get("video_play_count", 0),
+            "views_count": media_data.get("video_view_count", 0),
+        },
+        "updated_at": datetime.datetime.now().isoformat(),
     }
 
-def create_compact_data(media_data, url):
+def caption_text(media_data, default=None):
+    return media_data.get("edge_media_to_caption", {}).get("edges", [{}])[0].get("node", {}).get("text", default)
+
+def compact_model(media_data, url) -> CompactData:
     like_count = media_data.get("edge_media_preview_like", {}).get("count", 0)
     comment_count = media_data.get("edge_media_to_parent_comment", {}).get("count", 0)
     share_count = 0
     play_count = media_data.get("video_play_count", 0)
     views_count = media_data.get("video_view_count", 0)
+    owner = media_data.get("owner", {})
+
+    return CompactData(
+        post=CompactPost(
+            original_id=media_data.get("id"),
+            timestamp=convert_timestamp_to_iso(media_data.get("taken_at_timestamp")),
+            uri=url,
+            statistics=PostStatistics(
+                like_count=like_count,
+                comment_count=comment_count,
+                share_count=share_count,
+                play_count=play_count,
+                views_count=views_count,
+            ),
+            text=caption_text(media_data),
+            media_kind=media_kind(media_data),
+        ),
+        user=CompactUser(
+            original_id=owner.get("id"),
+            name=owner.get("full_name"),
+            username=owner.get("username"),
+            statistics=OwnerStatistics(
+                follower_count=owner.get("edge_followed_by", {}).get("count"),
+            ),
+        ),
+        created_at=datetime.datetime.now().isoformat(),
+        updated_at=datetime.datetime.now().isoformat(),
+        # A counter the embed markup showed in an unreadable form is None
+        engagement_count=sum(count or 0 for count in (like_count, comment_count, share_count, play_count, views_count)),
+    )
 
-    return {   
-        "post": {
-            "original_id": media_data.get("id"),
-            "timestamp": convert_timestamp_to_iso(media_data.get("taken_at_timestamp")),
-            "uri": url,
-            "statistics": {
-                "like_count": like_count,
-                "comment_count": comment_count,
-                "share_count": share_count,
-                "play_count": play_count,
-                "views_count": views_count,
-            },
-            "text": media_data.get("edge_media_to_caption", {}).get("edges", [{}])[0].get("node", {}).get("text"),
-            "media_kind": media_kind(media_data),
-        },
-        "user": {
-            "original_id": media_data.get("owner", {}).get("id"),
-            "name": media_data.get("owner", {}).get("full_name"),
-            "username": media_data.get("owner", {}).get("username"),
-            "statistics": {
-                "follower_count": media_data.get("owner", {}).get("edge_followed_by", {}).get("count"),
-            }
-        },
-        "created_at": datetime.datetime.now().isoformat(),
-        "updated_at": datetime.datetime.now().isoformat(),
-        "engagement_count": like_count + comment_count + share_count + play_count + views_count
-    }
+def structured_model(media_data, url) -> StructuredData:
+    text = caption_text(media_data, "")
+    owner = media_data.get("owner", {})
+
+    post = StructuredPost(
+        original_id=media_data.get("id"),
+        uri=url,
+        shortcode=media_data.get("shortcode"),
+        timestamp=convert_timestamp_to_iso(media_data.get("taken_at_timestamp")),
+        display_url=media_data.get("display_url"),
+        media_kind=media_kind(media_data),
+        is_video=media_data.get("is_video"),
+        text=caption_text(media_data),
+        tags=Tags(**extract_tags_from_text(text)),
+        statistics=PostStatistics(
+            like_count=media_data.get("edge_media_preview_like", {}).get("count", 0),
+            comment_count=media_data.get("edge_media_to_parent_comment", {}).get("count", 0),
+            share_count=media_data.get("edge_media_to_share", {}).get("count", 0),
+            play_count=media_data.get("video_play_count", 0),
+            views_count=media_data.get("video_view_count", 0),
+        ),
+        media_carousel=media_carousel(media_data),
+        tagged_users=tagged_users(media_data),
+        comments=comments_data(media_data.get("edge_media_to_parent_comment", {}).get("edges", [])),
+    )
 
-def create_structured_data(media_data, url):
-    caption_text = media_data.get("edge_media_to_caption", {}).get("edges", [{}])[0].get("node", {}).get("text", "")
-    tags_data = extract_tags_from_text(caption_text)
-    
-    post_data ={   
-        "post": {
-            "original_id": media_data.get("id"),
-            "uri": url,
-            "shortcode": media_data.get("shortcode"),
-            "timestamp": convert_timestamp_to_iso(media_data.get("taken_at_timestamp")),
-            "display_url": media_data.get("display_url"),
-            "media_kind": media_kind(media_data),
-            "is_video": media_data.get("is_video"),
-            "text": media_data.get("edge_media_to_caption", {}).get("edges", [{}])[0].get("node", {}).get("text"),
-            "tags": tags_data,
-            "statistics": {
-                "like_count": media_data.get("edge_media_preview_like", {}).get("count", 0),
-                "comment_count": media_data.get("edge_media_to_parent_comment", {}).get("count", 0),
-                "share_count": media_data.get("edge_media_to_share", {}).get("count", 0),
-                "play_count": media_data.get("video_play_count", 0),
-                "views_count": media_data.get("video_view_count", 0),
-            },
-            "media_carousel": media_carousel(media_data),
-            "tagged_users": tagged_users(media_data),
-            "comments": comments_data(media_data.get("edge_media_to_parent_comment", {}).get("edges", [])),
-            },
-        "owner": {
-            "original_id": media_data.get("owner", {}).get("id"),
-            "name": media_data.get("owner", {}).get("full_name"),
-            "username": media_data.get("owner", {}).get("username"),
-            "profile_picture": media_data.get("owner", {}).get("profile_pic_url"),
-            "is_verified": media_data.get("owner", {}).get("is_verified"),
-            "is_private": media_data.get("owner", {}).get("is_private"),
-            "statistics": {
-                "follower_count": media_data.get("owner", {}).get("edge_followed_by", {}).get("count"),
-                "media_count": media_data.get("owner", {}).get("edge_owner_to_timeline_media", {}).get("count"),
-            }
-        },
-        "updated_at": datetime.datetime.now().isoformat(),
-    }
-    
     if media_data.get("location"):
-        post_data["post"]["location"] =  location_data(media_data)
+        post.location = location_data(media_data)
 
     if media_data.get("has_audio"):
-        post_data["post"]["audio_info"] =  audio_info(media_data)
+        post.audio_info = audio_info(media_data)
 
     if media_data.get("is_video"):
-        post_data["post"]["statistics"]["video_duration"] =  media_data.get("video_duration")
+        post.statistics.video_duration = media_data.get("video_duration")
+
+    return StructuredData(
+        post=post,
+        owner=Owner(
+            original_id=owner.get("id"),
+            name=owner.get("full_name"),
+            username=owner.get("username"),
+            profile_picture=owner.get("profile_pic_url"),
+            is_verified=owner.get("is_verified"),
+            is_private=owner.get("is_private"),
+            statistics=OwnerStatistics(
+                follower_count=owner.get("edge_followed_by", {}).get("count"),
+                media_count=owner.get("edge_owner_to_timeline_media", {}).get("count"),
+            ),
+        ),
+        updated_at=datetime.datetime.now().isoformat(),
+    )
+
+def text_nodes(post):
+    nodes = [post]
+    for comment in post.comments:
+        nodes.append(comment)
+        nodes.extend(comment.child_comments)
+    return nodes
+
+async def add_text_analytics(data: StructuredData) -> StructuredData:
+    """Tag every comment and attach caption + comment totals to the post."""
+    await add_text_analytics_batch([data])
+    return data
+
+async def add_text_analytics_batch(items):
+    """add_text_analytics for many posts with a single analyze_batch call, so big batches use the pool."""
+    groups = [text_nodes(data.post) for data in items]
+    results = iter(await analyze_batch([node.text for nodes in groups for node in nodes]))
+    for data, nodes in zip(items, groups):
+        stats_list = [next(results) for _ in nodes]
+        for node, stats in zip(nodes, stats_list):
+            node.tags = Tags(hashtags=stats.hashtags, account_tags=stats.mentions, urls=stats.urls, emoji=stats.emoji)
+        data.post.text_analytics = TextAnalytics(texts=len(stats_list), **summarize(stats_list))
+    return items
 
-    return post_data
+def create_compact_data(media_data, url):
+    return compact_model(media_data, url).to_dict()
 
+def create_structured_data(media_data, url):
+    return structured_model(media_data, url).to_dict()
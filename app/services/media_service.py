@@ -0,0 +1,189 @@
+import os
+import re
+import asyncio
+import logging
+import aiohttp
+from fastapi import HTTPException
+from app.services.instagram_service import fetch_post_data, MEDIA_PROJECTION
+from app.utils.request_context import item_source
+from app.services.tiktok_service import load_tokens, fetch_tiktok_api_data, get_tiktok_playwright
+from app.utils.media_cache import MediaCache
+from app.utils.http_session import get_session
+from app.utils.upstreams import upstream_url
+
+logger = logging.getLogger(__name__)
+
+MEDIA_CHUNK_SIZE = int(os.getenv("MEDIA_CHUNK_SIZE", 64 * 1024))
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", "")
+MEDIA_CACHE_MAX_BYTES = int(os.getenv("MEDIA_CACHE_MAX_BYTES", 1024 * 1024 * 1024))
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# Upstream headers worth passing through to the client
+PASSTHROUGH_HEADERS = ("Content-Type", "Content-Length", "Content-Range", "Accept-Ranges", "ETag", "Last-Modified")
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+media_cache = MediaCache(MEDIA_CACHE_DIR, MEDIA_CACHE_MAX_BYTES) if MEDIA_CACHE_DIR else None
+
+def pick_media_url(node):
+    return node.get("video_url") or node.get("display_url")
+
+async def resolve_instagram_media(shortcode, index=0):
+    # Only media URLs are needed: skip comments and likers and build just those fields
+    post_data = await fetch_post_data(shortcode, statistics_only=True, projection=MEDIA_PROJECTION)
+    media_data = post_data.get("data", {}).get("xdt_shortcode_media") or {}
+    if not media_data:
+        raise HTTPException(status_code=404, detail=f"Post {shortcode} not found.")
+    if item_source.get() == "embed_markup":
+        # The markup only shows a poster image, proxying it for a reel would be wrong
+        raise HTTPException(
+            status_code=503,
+            detail=f"Media URLs for {shortcode} are unavailable right now, try again later.",
+            headers={"Retry-After": "30"},
+        )
+
+    edges = media_data.get("edge_sidecar_to_children", {}).get("edges", [])
+    if edges:
+        if index >= len(edges):
+            raise HTTPException(status_code=404, detail=f"Post {shortcode} has only {len(edges)} media items.")
+        return pick_media_url(edges[index].get("node", {}))
+    if index > 0:
+        raise HTTPException(status_code=404, detail=f"Post {shortcode} has only 1 media item.")
+    return pick_media_url(media_data)
+
+async def resolve_tiktok_media(content_id, index=0):
+    _, x_bogus, _ = load_tokens()
+    item = None
+    data = await fetch_tiktok_api_data(content_id, x_bogus) if x_bogus else None
+    if data:
+        item = data.get("itemInfo", {}).get("itemStruct")
+    if not item:
+        # TikTok redirects /@/video/<id> to the canonical URL of the post
+        item = await get_tiktok_playwright(f"https://www.tiktok.com/@/video/{content_id}")
+
+    images = (item.get("imagePost") or {}).get("images", [])
+    if images:
+        if index >= len(images):
+            raise HTTPException(status_code=404, detail=f"TikTok post {content_id} has only {len(images)} images.")
+        url_list = images[index].get("imageURL", {}).get("urlList", [])
+        return url_list[0] if url_list else None
+    if index > 0:
+        raise HTTPException(status_code=404, detail=f"TikTok post {content_id} has only 1 media item.")
+    video = item.get("video", {})
+    return video.get("playAddr") or video.get("downloadAddr")
+
+def parse_range(range_header, size):
+    """Return (start, end) inclusive for a single byte range, or None to serve everything."""
+    if not range_header:
+        return None
+    match = RANGE_PATTERN.match(range_header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        # Multiple or malformed ranges: ignoring the header is allowed by RFC 9110
+        return None
+    first, last = match.groups()
+    if first == "":
+        length = int(last)
+        if length == 0:
+            raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+def stream_cached_file(entry, range_header):
+    path, size, content_type = entry
+    byte_range = parse_range(range_header, size)
+    start, end = byte_range or (0, size - 1)
+    headers = {
+        "Content-Type": content_type,
+        "Content-Length": str(end - start + 1),
+        "Accept-Ranges": "bytes",
+    }
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+    def body():
+        with open(path, "rb") as file:
+            file.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = file.read(min(MEDIA_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    return (206 if byte_range else 200), headers, body()
+
+async def stream_upstream(media_url, range_header, cache_key):
+    headers = {"User-Agent": USER_AGENT}
+    if range_header:
+        headers["Range"] = range_header
+    # Media bodies can take a long time; only bound the wait between chunks
+    timeout = aiohttp.ClientTimeout(total=None, sock_read=30)
+    response = await get_session("media").get(upstream_url(media_url), headers=headers, timeout=timeout)
+
+    if response.status not in (200, 206):
+        status = response.status
+        response.release()
+        raise HTTPException(status_code=502, detail=f"Media upstream returned status {status}")
+
+    headers = {name: response.headers[name] for name in PASSTHROUGH_HEADERS if name in response.headers}
+    content_type = response.headers.get("Content-Type")
+    # Only complete downloads are worth caching
+    cache_to = media_cache.temp_path(cache_key) if media_cache and response.status == 200 else None
+
+    async def body():
+        # Disk I/O runs in threads; each chunk's write overlaps with sending it to the client
+        file = await asyncio.to_thread(open, cache_to, "wb") if cache_to else None
+        writing = None
+        completed = False
+        try:
+            async for chunk in response.content.iter_chunked(MEDIA_CHUNK_SIZE):
+                if file:
+                    if writing:
+                        await writing
+                    writing = asyncio.ensure_future(asyncio.to_thread(file.write, chunk))
+                yield chunk
+            if writing:
+                await writing
+            completed = True
+        finally:
+            response.release()
+            if file:
+                if writing:
+                    await asyncio.gather(writing, return_exceptions=True)
+                await asyncio.to_thread(file.close)
+                if completed:
+                    await asyncio.to_thread(media_cache.commit, cache_key, cache_to, content_type)
+                else:
+                    await asyncio.to_thread(os.remove, cache_to)
+
+    async def cleanup():
+        # Runs even when the client went away before the body was iterated
+        response.release()
+
+    return response.status, headers, body(), cleanup
+
+async def stream_media(platform, content_id, index=0, range_header=None):
+    """Stream media for a post, returning (status, headers, body iterator, cleanup)."""
+    cache_key = f"{platform}_{content_id}_{index}"
+    if media_cache:
+        entry = await asyncio.to_thread(media_cache.get, cache_key)
+        if entry:
+            logger.info(f"Serving {cache_key} from media cache")
+            status, headers, body = stream_cached_file(entry, range_header)
+            return status, headers, body, None
+
+    if platform == "instagram":
+        media_url = await resolve_instagram_media(content_id, index)
+    else:
+        media_url = await resolve_tiktok_media(content_id, index)
+    if not media_url:
+        raise HTTPException(status_code=404, detail="No media URL found for this post.")
+
+    logger.info(f"Streaming {cache_key} from upstream")
+    return await stream_upstream(media_url, range_header, cache_key)
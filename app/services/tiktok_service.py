@@ -1,10 +1,19 @@
-from app.utils.utils import extract_username_tiktok, extract_content_id
+from app.utils.utils import extract_username_tiktok, extract_content_id, get_proxy_list
 from app.utils.playwright_utils import get_page, navigate_and_wait
+from app.utils.hedging import hedged_call
+from app.utils.http_session import get_session, request_timeout
+from app.utils.deadline import timeout_for
+from app.utils.url_classifier import classify_url, needs_resolution, resolve_short_link
+from app.utils.upstreams import upstream_url
+from app.utils.block_detection import tiktok_block_reason
+from app.utils.retry import RetryPolicy, start_retry_scope
+from app.utils.negative_cache import TargetUnavailableError, check_unavailable, remember_unavailable
+from app.utils.circuit_breaker import (
+    BlockedError, CircuitOpenError, acquire_breaker, available_routes, guarded, remember, stale_or_raise,
+)
 import requests
 import os
 import re
-import aiohttp
-from TikTokApi import TikTokApi
 import logging
 import datetime
 import json
@@ -14,6 +23,14 @@ logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 TOKEN_FILE_PATH = os.getenv("TOKEN_FILE_PATH", "tokens.json")
+BULK_CONCURRENCY = int(os.getenv("BULK_CONCURRENCY", 8))
+# network: take itemStruct from the page's own item/detail XHRs, falling back to the embedded script
+# dom: wait for networkidle and parse the embedded script only
+TIKTOK_CAPTURE_MODE = os.getenv("TIKTOK_CAPTURE_MODE", "network").lower()
+TIKTOK_CAPTURE_TIMEOUT = float(os.getenv("TIKTOK_CAPTURE_TIMEOUT", 5))
+CAPTURE_URL_PATTERN = re.compile(r"/api/(?:reflow/)?item/detail")
+# webapp.video-detail status codes that describe the item rather than our request
+UNAVAILABLE_STATUS_CODES = {10204: "not_found", 10216: "private", 10222: "private"}
 
 def load_tokens():
     logger.debug(f"Attempting to load tokens from {TOKEN_FILE_PATH}")
@@ -48,32 +65,45 @@ def save_tokens(ms_token, x_bogus, expires_at):
     logger.info(f"Tokens saved to {TOKEN_FILE_PATH}")
 
 async def get_original_tiktok_link(tiktok_link):
+    info = classify_url(tiktok_link)
+    if info and info.platform == "tiktok" and info.kind in ("video", "photo"):
+        return tiktok_link
+
+    if needs_resolution(info):
+        resolved_url = await resolve_short_link(tiktok_link)
+        if resolved_url:
+            return resolved_url
+
     async with await get_page() as page:
         await navigate_and_wait(page, tiktok_link)
         return page.url
 
-async def get_tiktok_data(tiktok_link, max_retries=3, delay=3):
-    for attempt in range(max_retries):
-        async with await get_page() as page:
-            try:
-                ms_token, x_bogus, expires_at = load_tokens()
+def content_type_of(url):
+    info = classify_url(url)
+    return info.kind if info and info.kind in ("video", "photo") else 'photo'
+
+async def get_tiktok_data(tiktok_link, max_retries=3):
+    async def attempt(n):
+        try:
+            ms_token, x_bogus, expires_at = load_tokens()
 
-                if ms_token and x_bogus:
-                    # Tokens are still valid, return them without fetching new ones
-                    final_url = await get_original_tiktok_link(tiktok_link)
-                    username = extract_username_tiktok(final_url)
-                    content_id = extract_content_id(final_url)
-                    content_type = 'video' if '/video/' in final_url else 'photo'
-                    
-                    return ms_token, username, final_url, x_bogus, content_id, content_type
+            if ms_token and x_bogus:
+                # Tokens are still valid, return them without fetching new ones
+                final_url = await get_original_tiktok_link(tiktok_link)
+                username = extract_username_tiktok(final_url)
+                content_id = extract_content_id(final_url)
+                content_type = content_type_of(final_url)
 
+                return ms_token, username, final_url, x_bogus, content_id, content_type
+
+            async with await get_page() as page:
                 await navigate_and_wait(page, tiktok_link)
                 
                 # Extract necessary data
                 final_url = page.url
                 username = extract_username_tiktok(final_url)
                 content_id = extract_content_id(final_url)
-                content_type = 'video' if '/video/' in final_url else 'photo'
+                content_type = content_type_of(final_url)
                 
                 # Extract x-bogus
                 x_bogus = await extract_x_bogus(page)
@@ -86,14 +116,12 @@ async def get_tiktok_data(tiktok_link, max_retries=3, delay=3):
                     raise ValueError("Failed to extract necessary tokens")
                 
                 return ms_token, username, final_url, x_bogus, content_id, content_type
-            
-            except Exception as e:
-                logger.error(f"An error occurred on attempt {attempt + 1}: {str(e)}")
-                if attempt == max_retries - 1:
-                    raise
-                await asyncio.sleep(delay)
-    
-    raise Exception(f"Failed to extract TikTok data after {max_retries} attempts")
+        
+        except Exception as e:
+            logger.error(f"An error occurred on attempt {n + 1}: {str(e)}")
+            raise
+
+    return await RetryPolicy("tiktok_tokens", max_retries).run(attempt)
 
 async def extract_x_bogus(page):
     x_bogus = None
@@ -110,7 +138,7 @@ async def extract_x_bogus(page):
     return x_bogus
 
 async def fetch_tiktok_api_data(content_id, x_bogus):
-    api_url = "https://www.tiktok.com/api/reflow/item/detail"
+    api_url = upstream_url("https://www.tiktok.com/api/reflow/item/detail")
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
@@ -118,17 +146,51 @@ async def fetch_tiktok_api_data(content_id, x_bogus):
         "app_id": f"{os.getenv('TIKTOK_APP_ID')}",
         "channel": f"{os.getenv('TIKTOK_CHANNEL')}",
         "item_id": content_id,
-        "X-Bogus": x_bogus
     }
+    if x_bogus:
+        params["X-Bogus"] = x_bogus
+
+    session = get_session("tiktok")
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(api_url, headers=headers, params=params) as response:
+    async def get(proxy):
+        async with session.get(api_url, headers=headers, params=params, proxy=proxy, timeout=request_timeout()) as response:
+            reason = tiktok_block_reason(response.status)
+            if reason:
+                raise BlockedError("tiktok_reflow", reason)
             if response.status == 200:
                 return await response.json()
             else:
                 return None
 
+    stale_key = f"tiktok_reflow:{content_id}"
+    try:
+        routes = available_routes("tiktok_reflow", [None] + get_proxy_list())
+        data = await hedged_call("tiktok_reflow", guarded("tiktok_reflow", get), routes)
+    except (BlockedError, CircuitOpenError) as e:
+        return stale_or_raise(stale_key, e)
+    return remember(stale_key, data) if data else data
+
+async def fetch_tiktok_api_data_bulk(content_ids, x_bogus, concurrency=BULK_CONCURRENCY):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch_one(content_id):
+        start_retry_scope()
+        async with semaphore:
+            try:
+                data = await fetch_tiktok_api_data(content_id, x_bogus)
+                if data:
+                    return {"id": content_id, "data": data}
+                return {"id": content_id, "error": "TikTok returned no data."}
+            except Exception as e:
+                logger.error(f"Failed to fetch TikTok item {content_id}: {str(e)}")
+                return {"id": content_id, "error": str(e) or type(e).__name__}
+
+    return await asyncio.gather(*(fetch_one(content_id) for content_id in content_ids))
+
 async def get_tiktok_api_data(ms_token, username, content_url, content_id, content_type):
+    # TikTokApi pulls in its own Playwright stack, so only import it when this path is used
+    from TikTokApi import TikTokApi
+
     async with TikTokApi() as api:
         await api.create_sessions(ms_tokens=[ms_token], num_sessions=1)
         if content_type == 'video':
@@ -137,47 +199,131 @@ async def get_tiktok_api_data(ms_token, username, content_url, content_id, conte
             return await api.photo(url=content_url).info()
 
 class InvalidResponseException(Exception):
-    pass
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        # Lets the retry policy tell a 404 page apart from a layout it couldn't parse
+        self.status = status
 
-async def get_tiktok_playwright(content_url, max_retries=3, delay=3):
-    for attempt in range(max_retries):
-        async with await get_page() as page:
-            try:
-                logger.info(f"Fetching content: {content_url}")
-                response = await page.goto(content_url, wait_until="networkidle")
+def parse_embedded_item(content, content_id, target=None):
+    # Try SIGI_STATE first
+    sigi_state_match = re.search(r'<script id="SIGI_STATE" type="application/json">(.*?)</script>', content, re.DOTALL)
+    if sigi_state_match:
+        data = json.loads(sigi_state_match.group(1))
+        video_info = data.get("ItemModule", {}).get(content_id)
+        if video_info is None:
+            raise InvalidResponseException("TikTok returned an invalid response structure.")
+        return video_info
 
-                if response.status != 200:
-                    raise InvalidResponseException(f"TikTok returned an invalid response. Status code: {response.status}")
+    # Try __UNIVERSAL_DATA_FOR_REHYDRATION__ next
+    universal_data_match = re.search(r'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">(.*?)</script>', content, re.DOTALL)
+    if not universal_data_match:
+        return None
 
-                content = await page.content()
+    data = json.loads(universal_data_match.group(1))
+    default_scope = data.get("__DEFAULT_SCOPE__", {})
+    video_detail = default_scope.get("webapp.video-detail", {})
 
-                # Try SIGI_STATE first
-                sigi_state_match = re.search(r'<script id="SIGI_STATE" type="application/json">(.*?)</script>', content, re.DOTALL)
-                if sigi_state_match:
-                    data = json.loads(sigi_state_match.group(1))
-                    video_id = url.split('/')[-1]
-                    video_info = data["ItemModule"][video_id]
-                else:
-                    # Try __UNIVERSAL_DATA_FOR_REHYDRATION__ next
-                    universal_data_match = re.search(r'<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">(.*?)</script>', content, re.DOTALL)
-                    if not universal_data_match:
-                        raise InvalidResponseException("TikTok returned an invalid response structure.")
+    status_code = video_detail.get("statusCode", 0)
+    if status_code in UNAVAILABLE_STATUS_CODES and target:
+        raise TargetUnavailableError(target, UNAVAILABLE_STATUS_CODES[status_code])
+    if status_code != 0:
+        raise InvalidResponseException("TikTok returned an invalid response structure.")
 
-                    data = json.loads(universal_data_match.group(1))
-                    default_scope = data.get("__DEFAULT_SCOPE__", {})
-                    video_detail = default_scope.get("webapp.video-detail", {})
+    video_info = video_detail.get("itemInfo", {}).get("itemStruct")
+    if video_info is None:
+        raise InvalidResponseException("TikTok returned an invalid response structure.")
+    return video_info
 
-                    if video_detail.get("statusCode", 0) != 0:
-                        raise InvalidResponseException("TikTok returned an invalid response structure.")
+def capture_item_detail(page, content_id):
+    """Resolve with the first item/detail JSON payload for content_id the page receives."""
+    captured = asyncio.get_running_loop().create_future()
+
+    async def on_response(response):
+        if captured.done() or not CAPTURE_URL_PATTERN.search(response.url) or response.status != 200:
+            return
+        try:
+            data = await response.json()
+        except Exception:
+            return
+        if data.get("statusCode", data.get("status_code", 0)) != 0:
+            return
+        item = data.get("itemInfo", {}).get("itemStruct")
+        # The page also prefetches related items; only accept the one we asked for
+        if item and (not content_id or str(item.get("id")) == content_id) and not captured.done():
+            captured.set_result(item)
+
+    page.on("response", on_response)
+    return captured
+
+async def get_tiktok_playwright(content_url, max_retries=3):
+    stale_key = f"tiktok_item:{content_url}"
+    content_id = extract_content_id(content_url)
+    capture = TIKTOK_CAPTURE_MODE == "network"
+    target = f"tiktok_item:{content_id or content_url}"
+    check_unavailable(target)
 
-                    video_info = video_detail.get("itemInfo", {}).get("itemStruct")
+    async def attempt(n):
+        breaker = acquire_breaker("tiktok_browser")
+        # The breaker is taken before the page, so a failed page acquisition must release it too
+        try:
+            async with await get_page() as page:
+                logger.info(f"Fetching content: {content_url}")
+                captured = capture_item_detail(page, content_id) if capture else None
+                response = await page.goto(
+                    content_url,
+                    wait_until="domcontentloaded" if capture else "networkidle",
+                    timeout=timeout_for(30) * 1000,
+                )
+
+                reason = tiktok_block_reason(response.status, url=page.url)
+                if reason:
+                    raise BlockedError("tiktok_browser", reason)
+
+                if response.status == 404:
+                    raise TargetUnavailableError(target, "not_found")
+                if response.status != 200:
+                    raise InvalidResponseException(f"TikTok returned an invalid response. Status code: {response.status}", response.status)
+
+                video_info = None
+                if captured is not None:
+                    try:
+                        video_info = await asyncio.wait_for(captured, timeout_for(TIKTOK_CAPTURE_TIMEOUT))
+                    except asyncio.TimeoutError:
+                        logger.info("No item/detail response captured, falling back to embedded data")
+
+                if video_info is None:
+                    content = await page.content()
+                    video_info = parse_embedded_item(content, content_id, target)
                     if video_info is None:
+                        # No embedded data usually means a captcha page was served instead
+                        reason = tiktok_block_reason(response.status, content=content)
+                        if reason:
+                            raise BlockedError("tiktok_browser", reason)
                         raise InvalidResponseException("TikTok returned an invalid response structure.")
 
-                return video_info
+                breaker.record_success()
+                return remember(stale_key, video_info)
 
-            except Exception as e:
-                logger.error(f"An error occurred while scraping TikTok: {str(e)}")
-                raise
-    
-    raise Exception(f"Failed to extract TikTok data after {max_retries} attempts")
+        except BlockedError as e:
+            breaker.record_block(e.reason)
+            raise
+        except TargetUnavailableError:
+            # TikTok answered properly, the item just isn't there
+            breaker.record_success()
+            raise
+        except Exception as e:
+            breaker.release()
+            logger.error(f"An error occurred on attempt {n + 1} while scraping TikTok: {str(e)}")
+            raise
+        except BaseException:
+            # Cancelled or deadline hit while waiting for a page or mid-navigation
+            breaker.release()
+            raise
+
+    try:
+        return await RetryPolicy("tiktok_browser", max_retries).run(attempt)
+    except TargetUnavailableError as e:
+        remember_unavailable(e)
+        raise
+    except (BlockedError, CircuitOpenError) as e:
+        return stale_or_raise(stale_key, e)
@@ -0,0 +1,242 @@
+from app.services.instagram_service import fetch_post_statistics, fetch_profile_data
+from app.services.tiktok_service import fetch_tiktok_api_data, load_tokens
+from app.utils.http_session import get_session
+from app.utils.request_context import request_state, item_source
+from app.utils.retry import start_retry_scope
+from collections import deque
+import os
+import json
+import time
+import heapq
+import random
+import asyncio
+import logging
+import datetime
+
+logger = logging.getLogger(__name__)
+
+WATCH_DEFAULT_INTERVAL = float(os.getenv("WATCH_DEFAULT_INTERVAL", 3600))
+WATCH_MIN_INTERVAL = float(os.getenv("WATCH_MIN_INTERVAL", 60))
+# Each refresh lands somewhere in interval * (1 ± jitter)
+WATCH_JITTER = float(os.getenv("WATCH_JITTER", 0.1))
+# Refreshes started per second across the whole watch list
+WATCH_RATE = float(os.getenv("WATCH_RATE", 2))
+WATCH_CONCURRENCY = int(os.getenv("WATCH_CONCURRENCY", 4))
+WATCH_CHANGES_MAX = int(os.getenv("WATCH_CHANGES_MAX", 10000))
+WATCH_FILE = os.getenv("WATCH_FILE")
+WATCH_WEBHOOK_URL = os.getenv("WATCH_WEBHOOK_URL")
+
+TARGET_TYPES = ("instagram_post", "instagram_profile", "tiktok")
+
+async def instagram_post_statistics(shortcode):
+    return (await fetch_post_statistics(shortcode))["statistics"]
+
+async def instagram_profile_statistics(username):
+    user = (await fetch_profile_data(username)).get("data", {}).get("user") or {}
+    return {
+        "follower_count": user.get("edge_followed_by", {}).get("count", 0),
+        "following_count": user.get("edge_follow", {}).get("count", 0),
+        "media_count": user.get("edge_owner_to_timeline_media", {}).get("count", 0),
+    }
+
+async def tiktok_statistics(content_id):
+    ms_token, x_bogus, expires_at = load_tokens()
+    data = await fetch_tiktok_api_data(content_id, x_bogus)
+    if not data:
+        raise ValueError("TikTok returned no data.")
+    return data.get("itemInfo", {}).get("itemStruct", {}).get("stats", {})
+
+FETCHERS = {
+    "instagram_post": instagram_post_statistics,
+    "instagram_profile": instagram_profile_statistics,
+    "tiktok": tiktok_statistics,
+}
+
+class Target:
+    __slots__ = ("type", "id", "interval", "due", "statistics", "checked_at", "changed_at", "error")
+
+    def __init__(self, type, id, interval):
+        self.type = type
+        self.id = id
+        self.interval = interval
+        self.due = 0
+        self.statistics = None
+        self.checked_at = None
+        self.changed_at = None
+        self.error = None
+
+    @property
+    def key(self):
+        return (self.type, self.id)
+
+    def to_dict(self):
+        return {
+            "type": self.type,
+            "id": self.id,
+            "interval": self.interval,
+            "next_refresh_in": round(max(self.due - time.monotonic(), 0), 1),
+            "statistics": self.statistics,
+            "checked_at": self.checked_at,
+            "changed_at": self.changed_at,
+            "error": self.error,
+        }
+
+class Watcher:
+    """Re-polls the watch list in the background, spread evenly over each target's interval."""
+
+    def __init__(self):
+        self.targets = {}
+        # (due, key) entries; stale entries are skipped when the target's due time no longer matches
+        self.queue = []
+        self.changes = deque(maxlen=WATCH_CHANGES_MAX)
+        self.sequence = 0
+        # Created in start() so it binds to the serving event loop
+        self.wakeup = None
+        self.task = None
+        self.running = set()
+
+    def schedule(self, target, delay):
+        target.due = time.monotonic() + delay
+        heapq.heappush(self.queue, (target.due, target.key))
+        if self.wakeup:
+            self.wakeup.set()
+
+    def add(self, type, id, interval=None):
+        interval = max(float(interval or WATCH_DEFAULT_INTERVAL), WATCH_MIN_INTERVAL)
+        target = self.targets.get((type, id))
+        if target:
+            target.interval = interval
+        else:
+            target = self.targets[(type, id)] = Target(type, id, interval)
+        # Random first refresh so a freshly loaded list doesn't fire all at once
+        self.schedule(target, random.uniform(0, interval))
+        return target
+
+    def remove(self, type, id):
+        return self.targets.pop((type, id), None) is not None
+
+    def changes_since(self, since):
+        return [change for change in self.changes if change["seq"] > since]
+
+    def load(self):
+        if not WATCH_FILE or not os.path.exists(WATCH_FILE):
+            return
+        try:
+            with open(WATCH_FILE) as file:
+                for entry in json.load(file):
+                    self.add(entry["type"], entry["id"], entry.get("interval"))
+            logger.info(f"Loaded {len(self.targets)} watch targets from {WATCH_FILE}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Failed to load watch list: {e}")
+
+    def save(self):
+        if not WATCH_FILE:
+            return
+        entries = [{"type": t.type, "id": t.id, "interval": t.interval} for t in self.targets.values()]
+        with open(WATCH_FILE, "w") as file:
+            json.dump(entries, file)
+
+    def start(self):
+        self.wakeup = asyncio.Event()
+        self.load()
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            for task in list(self.running):
+                task.cancel()
+            await asyncio.gather(self.task, *self.running, return_exceptions=True)
+            self.task = None
+
+    async def next_due(self):
+        while True:
+            while self.queue:
+                due, key = self.queue[0]
+                target = self.targets.get(key)
+                if target is None or target.due != due:
+                    heapq.heappop(self.queue)
+                    continue
+                wait = due - time.monotonic()
+                if wait <= 0:
+                    heapq.heappop(self.queue)
+                    return target
+                break
+            else:
+                wait = None
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        # Watch refreshes queue behind live traffic in the fair schedulers
+        request_state.set({"tenant": "watch", "priority": "batch"})
+        semaphore = asyncio.Semaphore(WATCH_CONCURRENCY)
+        spacing = 1 / WATCH_RATE if WATCH_RATE > 0 else 0
+        while True:
+            target = await self.next_due()
+            await semaphore.acquire()
+            task = asyncio.create_task(self.refresh(target))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+            task.add_done_callback(lambda _: semaphore.release())
+            # Keep the upstream request rate flat no matter how many targets fall due together
+            await asyncio.sleep(spacing)
+
+    async def refresh(self, target):
+        start_retry_scope()
+        item_source.set(None)
+        try:
+            statistics = await FETCHERS[target.type](target.id)
+            target.error = None
+            if item_source.get() == "stale":
+                # A remembered answer from an open circuit says nothing new about the target
+                logger.info(f"Watch refresh for {target.type} {target.id} got a stale answer, keeping the last snapshot")
+                statistics = None
+        except Exception as e:
+            target.error = getattr(e, "detail", None) or str(e) or type(e).__name__
+            logger.warning(f"Watch refresh failed for {target.type} {target.id}: {target.error}")
+            statistics = None
+
+        now = datetime.datetime.now().isoformat()
+        target.checked_at = now
+        if statistics is not None and statistics != target.statistics:
+            self.sequence += 1
+            change = {
+                "seq": self.sequence,
+                "type": target.type,
+                "id": target.id,
+                "previous": target.statistics,
+                "statistics": statistics,
+                "observed_at": now,
+            }
+            target.statistics = statistics
+            target.changed_at = now
+            self.changes.append(change)
+            if WATCH_WEBHOOK_URL:
+                await self.emit(change)
+
+        if target.key in self.targets:
+            jitter = random.uniform(-WATCH_JITTER, WATCH_JITTER)
+            self.schedule(target, target.interval * (1 + jitter))
+
+    async def emit(self, change):
+        try:
+            async with get_session("webhook").post(WATCH_WEBHOOK_URL, json=change) as response:
+                if response.status >= 400:
+                    logger.warning(f"Watch webhook returned {response.status}")
+        except Exception as e:
+            logger.warning(f"Watch webhook failed: {e}")
+
+    def snapshot(self):
+        return {
+            "targets": len(self.targets),
+            "in_flight": len(self.running),
+            "last_seq": self.sequence,
+            "rate": WATCH_RATE,
+        }
+
+watcher = Watcher()
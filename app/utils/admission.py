@@ -0,0 +1,183 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import deque
+from fastapi.responses import JSONResponse
+from app.utils.deadline import remaining
+from app.utils.scheduler import BROWSER_CONCURRENCY
+from app.utils.url_classifier import classify_url
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Queued requests allowed per unit of concurrency limit before new ones are shed
+ADMISSION_QUEUE_FACTOR = float(os.getenv("ADMISSION_QUEUE_FACTOR", 2))
+# Longest a request waits for admission before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 10))
+# How far recent latency may drift above the long-run average before the limit shrinks
+ADMISSION_TOLERANCE = float(os.getenv("ADMISSION_TOLERANCE", 1.5))
+ADMISSION_SMOOTHING = float(os.getenv("ADMISSION_SMOOTHING", 0.2))
+
+# Paths that never queue: health checks, metrics and the watch list API
+EXEMPT_PREFIXES = ("/health", "/metrics", "/debug", "/watch")
+
+class AdaptiveLimiter:
+    """Concurrency limit per route class that follows observed latency.
+
+    Gradient style: when short-term latency rises above the long-term average the
+    limit shrinks proportionally; while latency holds steady it grows by a sqrt(limit)
+    allowance. Requests over the limit wait in a bounded FIFO, beyond that they are shed.
+    """
+
+    def __init__(self, name, initial, minimum, maximum):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.waiters = deque()
+        self.long_latency = None
+        self.short_latency = None
+        self.stats = {"admitted": 0, "queued": 0, "shed": 0}
+
+    @property
+    def max_queue(self):
+        return int(self.limit * ADMISSION_QUEUE_FACTOR)
+
+    def retry_after(self):
+        # Time for the current backlog to drain at the observed latency
+        latency = self.long_latency or 1.0
+        backlog = len(self.waiters) + 1
+        return max(math.ceil(backlog * latency / max(self.limit, 1)), 1)
+
+    def reject(self, reason):
+        self.stats["shed"] += 1
+        retry_after = self.retry_after()
+        logger.warning(f"Shedding {self.name} request ({reason}), retry after {retry_after}s")
+        return JSONResponse(
+            status_code=503,
+            content={"detail": f"Server is overloaded ({self.name}), try again later."},
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    async def acquire(self):
+        """Return None once admitted, or a 503 response to send instead."""
+        if self.in_flight < int(self.limit) and not self.waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return None
+        if len(self.waiters) >= self.max_queue:
+            return self.reject("queue full")
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        self.stats["queued"] += 1
+        left = remaining()
+        timeout = ADMISSION_QUEUE_TIMEOUT if left is None else min(ADMISSION_QUEUE_TIMEOUT, max(left, 0))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            if future.done():
+                # Admitted just as the wait ran out
+                self.stats["admitted"] += 1
+                return None
+            future.cancel()
+            return self.reject("queue timeout")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(None)
+            else:
+                future.cancel()
+            raise
+        finally:
+            if future in self.waiters:
+                self.waiters.remove(future)
+        self.stats["admitted"] += 1
+        return None
+
+    def release(self, latency):
+        self.in_flight -= 1
+        if latency is not None:
+            self.update(latency)
+        while self.waiters and self.in_flight < int(self.limit):
+            future = self.waiters.popleft()
+            if future.done():
+                continue
+            self.in_flight += 1
+            future.set_result(True)
+
+    def update(self, latency):
+        if self.long_latency is None:
+            self.long_latency = self.short_latency = latency
+            return
+        self.short_latency = self.short_latency * 0.5 + latency * 0.5
+        self.long_latency = self.long_latency * 0.95 + latency * 0.05
+        gradient = max(0.5, min(1.0, ADMISSION_TOLERANCE * self.long_latency / self.short_latency))
+        target = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * (1 - ADMISSION_SMOOTHING) + target * ADMISSION_SMOOTHING
+        self.limit = min(max(limit, self.minimum), self.maximum)
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "limit": round(self.limit, 1),
+            "in_flight": self.in_flight,
+            "waiting": len(self.waiters),
+            "max_queue": self.max_queue,
+            "latency_short": round(self.short_latency, 3) if self.short_latency else None,
+            "latency_long": round(self.long_latency, 3) if self.long_latency else None,
+        }
+
+limiters = {
+    # Instagram requests that only need HTTP calls
+    "http": AdaptiveLimiter(
+        "http",
+        initial=int(os.getenv("ADMISSION_HTTP_LIMIT", 64)),
+        minimum=int(os.getenv("ADMISSION_HTTP_MIN", 4)),
+        maximum=int(os.getenv("ADMISSION_HTTP_MAX", 512)),
+    ),
+    # Anything that may need a browser page: TikTok and share links
+    "browser": AdaptiveLimiter(
+        "browser",
+        initial=int(os.getenv("ADMISSION_BROWSER_LIMIT", BROWSER_CONCURRENCY * 2)),
+        minimum=int(os.getenv("ADMISSION_BROWSER_MIN", BROWSER_CONCURRENCY)),
+        maximum=int(os.getenv("ADMISSION_BROWSER_MAX", BROWSER_CONCURRENCY * 8)),
+    ),
+}
+
+def route_class(request):
+    path = request.url.path
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/scrape-tiktok") or path.startswith("/media/tiktok"):
+        return "browser"
+    if path == "/scrape-instagram-post":
+        # Share links and other non-canonical URLs may need the browser to resolve
+        info = classify_url(request.query_params.get("url") or "")
+        if info is None or info.kind not in ("post", "reel"):
+            return "browser"
+    return "http"
+
+async def admit(request, call_next):
+    name = route_class(request) if ADMISSION_ENABLED else None
+    if name is None:
+        return await call_next(request)
+    limiter = limiters[name]
+    rejection = await limiter.acquire()
+    if rejection is not None:
+        return rejection
+    started = time.monotonic()
+    latency = None
+    try:
+        response = await call_next(request)
+        # Bulk POSTs take as long as their batch is big, which says nothing about load
+        if request.method == "GET":
+            latency = time.monotonic() - started
+        return response
+    finally:
+        limiter.release(latency)
+
+def admission_stats():
+    return {name: limiter.snapshot() for name, limiter in limiters.items()}
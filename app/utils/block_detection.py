@@ -0,0 +1,35 @@
+import re
+
+# Statuses Instagram and TikTok use when they throttle or want a login
+BLOCK_STATUSES = {401, 403, 429}
+
+INSTAGRAM_BLOCK_MESSAGES = re.compile(
+    r'checkpoint_required|login_required|"require_login":\s*true|Please wait a few minutes|challenge_required'
+)
+INSTAGRAM_LOGIN_URL = re.compile(r'instagram\.com/(?:accounts/login|challenge)')
+
+TIKTOK_CAPTCHA = re.compile(r'captcha-verify|captcha_container|secsdk-captcha|verify-bar-close')
+TIKTOK_LOGIN_URL = re.compile(r'tiktok\.com/login')
+
+def instagram_block_reason(status, content_type="", body="", url="", expect_html=False):
+    """Return why an Instagram response looks like a block, or None."""
+    if status in BLOCK_STATUSES:
+        return f"status_{status}"
+    if url and INSTAGRAM_LOGIN_URL.search(url):
+        return "login_wall"
+    if body and INSTAGRAM_BLOCK_MESSAGES.search(body[:4096]):
+        return "login_wall"
+    if status == 200 and "text/html" in content_type and not expect_html:
+        # The JSON endpoints only answer with HTML when redirecting to the login page
+        return "login_wall"
+    return None
+
+def tiktok_block_reason(status, url="", content=""):
+    """Return why a TikTok response looks like a block, or None."""
+    if status in BLOCK_STATUSES:
+        return f"status_{status}"
+    if url and TIKTOK_LOGIN_URL.search(url):
+        return "login_wall"
+    if content and TIKTOK_CAPTCHA.search(content):
+        return "captcha"
+    return None
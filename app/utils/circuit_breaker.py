@@ -0,0 +1,158 @@
+import os
+import time
+import logging
+from fastapi import HTTPException
+from app.utils.cache import LRUCache
+from app.utils.request_context import mark_stale
+from app.utils.negative_cache import TargetUnavailableError
+
+logger = logging.getLogger(__name__)
+
+# Consecutive block signals that open a circuit
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", 5))
+# Seconds a circuit stays open before a single probe request is let through
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", 60))
+STALE_CACHE_SIZE = int(os.getenv("STALE_CACHE_SIZE", 200))
+STALE_CACHE_TTL = float(os.getenv("STALE_CACHE_TTL", 24 * 3600))
+
+class BlockedError(HTTPException):
+    """The upstream answered with a login wall, captcha or throttling page."""
+
+    def __init__(self, upstream, reason, retry_after=None):
+        super().__init__(status_code=503, detail=f"{upstream} is blocking requests ({reason})")
+        self.upstream = upstream
+        self.reason = reason
+        # The upstream's Retry-After header, when it sent one
+        self.retry_after = retry_after
+
+class CircuitOpenError(HTTPException):
+    def __init__(self, upstream, retry_after):
+        super().__init__(
+            status_code=503,
+            detail=f"{upstream} is currently blocking requests, try again later",
+            headers={"Retry-After": str(max(int(retry_after), 1))},
+        )
+        self.upstream = upstream
+
+class CircuitBreaker:
+    def __init__(self, name):
+        self.name = name
+        self.state = "closed"
+        self.blocks = 0
+        self.opened_at = 0
+        self.probing = False
+        self.last_reason = None
+        self.last_success = None
+
+    def is_available(self):
+        if self.state == "open" and time.monotonic() - self.opened_at >= BREAKER_RESET_TIMEOUT:
+            self.state = "half_open"
+        return self.state == "closed" or (self.state == "half_open" and not self.probing)
+
+    def begin(self):
+        # While half open, only one request at a time probes the upstream
+        if self.state == "half_open":
+            self.probing = True
+
+    def retry_after(self):
+        return max(BREAKER_RESET_TIMEOUT - (time.monotonic() - self.opened_at), 0)
+
+    def record_success(self, with_data=True):
+        if self.state != "closed":
+            logger.info(f"Circuit {self.name} closed")
+        self.state = "closed"
+        self.blocks = 0
+        self.probing = False
+        # Only real data vouches for later empty answers (see recently_healthy)
+        if with_data:
+            self.last_success = time.monotonic()
+
+    def recently_healthy(self, window):
+        return self.state == "closed" and self.last_success is not None and time.monotonic() - self.last_success <= window
+
+    def record_block(self, reason):
+        self.blocks += 1
+        self.last_reason = reason
+        self.probing = False
+        if self.state == "half_open" or self.blocks >= BREAKER_THRESHOLD:
+            if self.state != "open":
+                logger.warning(f"Circuit {self.name} opened after {self.blocks} blocks ({reason})")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        # The probe ended without a verdict (e.g. a timeout), let another one through
+        self.probing = False
+
+    def snapshot(self):
+        return {"state": self.state, "blocks": self.blocks, "last_reason": self.last_reason}
+
+breakers = {}
+
+def get_breaker(upstream, route=None):
+    key = f"{upstream}:{route or 'direct'}"
+    if key not in breakers:
+        breakers[key] = CircuitBreaker(key)
+    return breakers[key]
+
+def breaker_stats():
+    return {name: breaker.snapshot() for name, breaker in breakers.items()}
+
+def available_routes(upstream, routes):
+    """Drop routes whose circuit is open; fail fast when none are left."""
+    allowed = [route for route in routes if get_breaker(upstream, route).is_available()]
+    if not allowed:
+        retry_after = min(get_breaker(upstream, route).retry_after() for route in routes)
+        raise CircuitOpenError(upstream, retry_after)
+    return allowed
+
+def untried_route(upstream, routes):
+    """retry_blocked check for calls that rotate through routes, starting attempt n at route n."""
+    def check(attempt):
+        usable = [route for route in routes if get_breaker(upstream, route).is_available()]
+        return 1 < len(usable) and attempt < len(usable)
+    return check
+
+def acquire_breaker(upstream, route=None):
+    """Return the breaker for a single guarded call, or fail fast if it is open."""
+    breaker = get_breaker(upstream, route)
+    if not breaker.is_available():
+        raise CircuitOpenError(upstream, breaker.retry_after())
+    breaker.begin()
+    return breaker
+
+def guarded(upstream, attempt):
+    """Wrap attempt(route) so its outcome feeds the breaker for that route."""
+    async def guarded_attempt(route):
+        breaker = get_breaker(upstream, route)
+        breaker.begin()
+        try:
+            result = await attempt(route)
+        except BlockedError as e:
+            breaker.record_block(e.reason)
+            raise
+        except TargetUnavailableError:
+            # The upstream answered properly, the target just isn't there
+            breaker.record_success(with_data=False)
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.record_success()
+        return result
+    return guarded_attempt
+
+# Last good answer per target, served with a staleness marker while a circuit is open
+last_good = LRUCache(STALE_CACHE_SIZE, ttl=STALE_CACHE_TTL)
+
+def remember(key, value):
+    last_good.set(key, value)
+    return value
+
+def stale_or_raise(key, error):
+    value = last_good.get(key)
+    if value is None:
+        raise error
+    logger.warning(f"Serving stale data for {key}: {error.detail}")
+    mark_stale(error.detail)
+    return value
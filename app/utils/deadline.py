@@ -0,0 +1,122 @@
+import os
+import time
+import asyncio
+import logging
+import contextvars
+from urllib.parse import parse_qs
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# Server defaults when the client doesn't send X-Request-Timeout or ?timeout=
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", 60))
+# Bulk endpoints are POSTs and legitimately take longer
+BULK_REQUEST_TIMEOUT = float(os.getenv("BULK_REQUEST_TIMEOUT", 600))
+REQUEST_TIMEOUT_MAX = float(os.getenv("REQUEST_TIMEOUT_MAX", 900))
+
+# Absolute time.monotonic() by which the current request must be answered
+request_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(HTTPException):
+    def __init__(self):
+        super().__init__(status_code=504, detail="Request deadline exceeded.")
+
+def remaining():
+    deadline = request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+def check_deadline():
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded()
+
+def timeout_for(default):
+    """Clamp a per-call timeout (seconds) to what is left of the request deadline."""
+    left = remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded()
+    return min(default, left) if default else left
+
+async def within_deadline(awaitable):
+    left = remaining()
+    if left is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, max(left, 0))
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded()
+
+def requested_timeout(scope):
+    headers = dict(scope.get("headers") or [])
+    value = headers.get(b"x-request-timeout", b"").decode("latin-1")
+    if not value:
+        value = (parse_qs(scope.get("query_string", b"").decode("latin-1")).get("timeout") or [""])[0]
+    default = BULK_REQUEST_TIMEOUT if scope.get("method") == "POST" else REQUEST_TIMEOUT
+    try:
+        timeout = float(value) if value else default
+    except ValueError:
+        timeout = default
+    return min(max(timeout, 0.1), REQUEST_TIMEOUT_MAX)
+
+class DeadlineMiddleware:
+    """Give each request a deadline and cancel its work on expiry or client disconnect.
+
+    The middleware is the only reader of the ASGI receive channel: it forwards messages
+    to the app and notices http.disconnect even while the app is busy upstream.
+    Once the response has started, only a disconnect stops it (media streams run long).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout = requested_timeout(scope)
+        request_deadline.set(time.monotonic() + timeout)
+        messages = asyncio.Queue()
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        app_task = asyncio.ensure_future(self.app(scope, messages.get, send_wrapper))
+
+        async def pump():
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not app_task.done():
+                        logger.info(f"Client disconnected, cancelling {scope.get('path')}")
+                        app_task.cancel()
+                    return
+
+        pump_task = asyncio.ensure_future(pump())
+        try:
+            done, _ = await asyncio.wait({app_task}, timeout=timeout)
+            if not done and started:
+                await asyncio.wait({app_task})
+            elif not done:
+                logger.warning(f"Deadline of {timeout:.1f}s exceeded for {scope.get('path')}")
+                app_task.cancel()
+                await asyncio.gather(app_task, return_exceptions=True)
+                error = DeadlineExceeded()
+                await send({"type": "http.response.start", "status": error.status_code,
+                            "headers": [(b"content-type", b"application/json")]})
+                await send({"type": "http.response.body", "body": b'{"detail":"Request deadline exceeded."}'})
+                return
+            if app_task.cancelled():
+                return
+            app_task.result()
+        finally:
+            pump_task.cancel()
+            if not app_task.done():
+                app_task.cancel()
@@ -0,0 +1,122 @@
+import os
+import asyncio
+import logging
+from collections import deque
+from app.utils.scheduler import upstream_scheduler
+
+logger = logging.getLogger(__name__)
+
+# Start a hedge once the primary attempt is slower than this percentile of recent latencies
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 95))
+# Delay used until enough latency samples have been collected
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", 2.0))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", 20))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", 500))
+# Each call earns this fraction of a hedge, so hedges stay below ~10% extra load
+HEDGE_BUDGET_RATIO = float(os.getenv("HEDGE_BUDGET_RATIO", 0.1))
+HEDGE_BUDGET_BURST = float(os.getenv("HEDGE_BUDGET_BURST", 10))
+
+class LatencyTracker:
+    def __init__(self, window=HEDGE_WINDOW):
+        self.samples = deque(maxlen=window)
+
+    def record(self, latency):
+        self.samples.append(latency)
+
+    def percentile(self, p):
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(int(len(ordered) * p / 100), len(ordered) - 1)
+        return ordered[index]
+
+class HedgeBudget:
+    def __init__(self, ratio=HEDGE_BUDGET_RATIO, burst=HEDGE_BUDGET_BURST):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = burst
+
+    def deposit(self):
+        self.tokens = min(self.tokens + self.ratio, self.burst)
+
+    def withdraw(self):
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+class Hedger:
+    def __init__(self, name):
+        self.name = name
+        self.latency = LatencyTracker()
+        self.budget = HedgeBudget()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "budget_exhausted": 0}
+
+    def delay(self):
+        if len(self.latency.samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return self.latency.percentile(HEDGE_PERCENTILE)
+
+    def snapshot(self):
+        return {
+            **self.stats,
+            "hedge_delay": self.delay(),
+            "p50": self.latency.percentile(50),
+            "p99": self.latency.percentile(99),
+            "budget_tokens": round(self.budget.tokens, 2),
+        }
+
+hedgers = {}
+
+def get_hedger(upstream):
+    if upstream not in hedgers:
+        hedgers[upstream] = Hedger(upstream)
+    return hedgers[upstream]
+
+def hedge_stats():
+    return {name: hedger.snapshot() for name, hedger in hedgers.items()}
+
+async def hedged_call(upstream, attempt, routes):
+    """Call attempt(routes[0]) and, if it is slow, race attempt(routes[1]) against it.
+
+    attempt must be idempotent. The first successful result wins and the other
+    attempt is cancelled. An error is raised only when every started attempt failed.
+    """
+    hedger = get_hedger(upstream)
+    hedger.stats["calls"] += 1
+
+    async def scheduled_attempt(route):
+        async with upstream_scheduler.slot():
+            return await attempt(route)
+
+    hedger.budget.deposit()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+
+    primary = asyncio.ensure_future(scheduled_attempt(routes[0]))
+    pending = {primary}
+    try:
+        if len(routes) > 1:
+            done, _ = await asyncio.wait(pending, timeout=hedger.delay())
+            if not done:
+                if hedger.budget.withdraw():
+                    logger.info(f"Primary {upstream} attempt is slow, starting a hedged attempt")
+                    hedger.stats["hedged"] += 1
+                    pending.add(asyncio.ensure_future(scheduled_attempt(routes[1])))
+                else:
+                    hedger.stats["budget_exhausted"] += 1
+
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    hedger.latency.record(loop.time() - start)
+                    if task is not primary:
+                        hedger.stats["hedge_wins"] += 1
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
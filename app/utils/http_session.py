@@ -0,0 +1,37 @@
+import os
+import logging
+import aiohttp
+from app.utils.deadline import timeout_for
+
+logger = logging.getLogger(__name__)
+
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", 20))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", 300))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+
+# One long-lived session per upstream so connections (and TLS) are reused across requests
+sessions = {}
+
+def get_session(upstream):
+    session = sessions.get(upstream)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_POOL_LIMIT,
+            limit_per_host=HTTP_POOL_LIMIT_PER_HOST,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        )
+        session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT))
+        sessions[upstream] = session
+        logger.info(f"Opened HTTP session for {upstream}")
+    return session
+
+def request_timeout():
+    # Session default, shortened to what is left of the request deadline
+    return aiohttp.ClientTimeout(total=timeout_for(HTTP_TIMEOUT))
+
+async def close_sessions():
+    for upstream, session in list(sessions.items()):
+        await session.close()
+        logger.info(f"Closed HTTP session for {upstream}")
+    sessions.clear()
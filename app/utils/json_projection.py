@@ -0,0 +1,144 @@
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# ijson is optional; without it projected fetches fall back to a full json.loads()
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+STREAMING_PARSE = os.getenv("STREAMING_PARSE", "true").lower() in ("1", "true", "yes") and ijson is not None
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", 64 * 1024))
+
+STARTS = frozenset(("start_map", "start_array"))
+ENDS = frozenset(("end_map", "end_array"))
+
+class Projection:
+    """A set of dotted ijson prefixes to keep. Arrays are written as ".item".
+
+    A path keeps its whole subtree; everything outside the paths and their ancestors is skipped.
+    """
+
+    def __init__(self, name, paths):
+        self.name = name
+        self.paths = set(paths)
+        self.ancestors = set()
+        for path in self.paths:
+            parts = path.split(".")
+            for end in range(len(parts)):
+                self.ancestors.add(".".join(parts[:end]))
+        self.cache = {}
+
+    def wants(self, prefix):
+        # Prefixes repeat for every array item, so the answer is memoized per prefix
+        wanted = self.cache.get(prefix)
+        if wanted is None:
+            wanted = self.cache[prefix] = self.check(prefix)
+        return wanted
+
+    def check(self, prefix):
+        if prefix in self.ancestors or prefix in self.paths:
+            return True
+        while "." in prefix:
+            prefix = prefix.rsplit(".", 1)[0]
+            if prefix in self.paths:
+                return True
+        return False
+
+class ProjectedBuilder:
+    """Build only the wanted parts of a document from ijson basic_parse events.
+
+    Events can be fed in pieces as the body arrives. Unwanted subtrees are skipped by
+    counting nesting depth, so their events cost no prefix bookkeeping and allocate nothing.
+    """
+
+    def __init__(self, projection):
+        self.builder = ijson.ObjectBuilder()
+        self.wants = projection.wants
+        # (prefix, item prefix) of the open containers being built; item prefix is None for maps
+        self.stack = []
+        self.value_prefix = ""
+        self.skip_depth = 0
+        self.skip_next = False
+
+    @property
+    def value(self):
+        return getattr(self.builder, "value", None)
+
+    def feed(self, events):
+        builder, wants, stack = self.builder, self.wants, self.stack
+        value_prefix, skip_depth, skip_next = self.value_prefix, self.skip_depth, self.skip_next
+        for event, value in events:
+            if skip_depth:
+                if event in STARTS:
+                    skip_depth += 1
+                elif event in ENDS:
+                    skip_depth -= 1
+                continue
+            if event == "map_key":
+                parent = stack[-1][0]
+                key_prefix = f"{parent}.{value}" if parent else value
+                if wants(key_prefix):
+                    builder.event(event, value)
+                    value_prefix = key_prefix
+                else:
+                    skip_next = True
+                continue
+            if event in ENDS:
+                builder.event(event, value)
+                stack.pop()
+                if stack and stack[-1][1] is not None:
+                    value_prefix = stack[-1][1]
+                continue
+            if skip_next or not wants(value_prefix):
+                skip_next = False
+                if event in STARTS:
+                    skip_depth = 1
+                continue
+            builder.event(event, value)
+            if event == "start_map":
+                stack.append((value_prefix, None))
+            elif event == "start_array":
+                item_prefix = f"{value_prefix}.item" if value_prefix else "item"
+                stack.append((value_prefix, item_prefix))
+                value_prefix = item_prefix
+        self.value_prefix, self.skip_depth, self.skip_next = value_prefix, skip_depth, skip_next
+
+def project_events(events, projection):
+    builder = ProjectedBuilder(projection)
+    builder.feed(events)
+    return builder.value
+
+async def read_head(chunks, size=4096):
+    """Read at least size bytes (or the whole body) from an async iterator of chunks."""
+    head = b""
+    async for chunk in chunks:
+        head += chunk
+        if len(head) >= size:
+            break
+    return head
+
+async def parse_projected(head, chunks, projection):
+    """Parse a body that started with head and continues in chunks (an async iterator).
+
+    A malformed or truncated body raises json.JSONDecodeError, as json.loads() would.
+    """
+    builder = ProjectedBuilder(projection)
+    events = ijson.sendable_list()
+    parser = ijson.basic_parse_coro(events, use_float=True)
+    try:
+        parser.send(head)
+        builder.feed(events)
+        del events[:]
+        async for chunk in chunks:
+            parser.send(chunk)
+            builder.feed(events)
+            del events[:]
+        parser.close()
+    except ijson.JSONError as e:
+        raise json.JSONDecodeError(f"Invalid JSON body: {e}", "", 0) from e
+    builder.feed(events)
+    return builder.value
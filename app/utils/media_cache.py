@@ -0,0 +1,90 @@
+import os
+import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class MediaCache:
+    """Disk cache for proxied media files, evicted LRU by total bytes.
+
+    get and commit touch the disk, so callers on the event loop run them in a thread;
+    the lock keeps the index consistent across those threads.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (path, size, content_type)
+        self.total_bytes = 0
+        self.lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        self.load()
+
+    def load(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(".part"):
+                # Left over from an interrupted download
+                os.remove(path)
+                continue
+            if os.path.isfile(path):
+                files.append((os.path.getmtime(path), name, path))
+
+        for _, name, path in sorted(files):
+            key, _, ext = name.partition(".")
+            content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+            size = os.path.getsize(path)
+            self.entries[key] = (path, size, content_type)
+            self.total_bytes += size
+        self.evict()
+        logger.info(f"Media cache loaded: {len(self.entries)} files, {self.total_bytes} bytes")
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if not os.path.exists(entry[0]):
+                self.discard(key)
+                return None
+            self.entries.move_to_end(key)
+            os.utime(entry[0])
+            return entry
+
+    def temp_path(self, key):
+        return os.path.join(self.directory, f"{key}.{os.getpid()}.{id(object())}.part")
+
+    def commit(self, key, temp_path, content_type):
+        ext = mimetypes.guess_extension(content_type or "") or ".bin"
+        path = os.path.join(self.directory, f"{key}{ext}")
+        size = os.path.getsize(temp_path)
+        if size > self.max_bytes:
+            os.remove(temp_path)
+            return
+        with self.lock:
+            self.discard(key)
+            os.replace(temp_path, path)
+            self.entries[key] = (path, size, content_type or "application/octet-stream")
+            self.total_bytes += size
+            self.evict()
+
+    def discard(self, key):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return
+            self.total_bytes -= entry[1]
+            try:
+                os.remove(entry[0])
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        with self.lock:
+            while self.total_bytes > self.max_bytes and self.entries:
+                key = next(iter(self.entries))
+                logger.debug(f"Evicting {key} from media cache")
+                self.discard(key)
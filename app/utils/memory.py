@@ -0,0 +1,168 @@
+import os
+import time
+import logging
+import tracemalloc
+from contextlib import contextmanager
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the corresponding check
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", 0))
+BROWSER_MEMORY_BUDGET_MB = float(os.getenv("BROWSER_MEMORY_BUDGET_MB", 0))
+MEMORY_SAMPLE_INTERVAL = float(os.getenv("MEMORY_SAMPLE_INTERVAL", 1.0))
+MEMORY_PROFILING = os.getenv("MEMORY_PROFILING", "").lower() in ("1", "true", "yes")
+MEMORY_PROFILING_FRAMES = int(os.getenv("MEMORY_PROFILING_FRAMES", 1))
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+MB = 1024 * 1024
+
+def rss_of(pid):
+    try:
+        with open(f"/proc/{pid}/statm") as file:
+            return int(file.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+def child_pids(root):
+    """All descendants of root (Playwright's driver and the Chromium processes under it)."""
+    parents = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as file:
+                # The command name may contain spaces, so split after the closing paren
+                ppid = int(file.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+
+    found, stack = [], [root]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+class MemorySampler:
+    """Caches RSS readings so admission checks don't walk /proc on every request."""
+
+    def __init__(self):
+        self.sampled_at = 0
+        self.process_rss = 0
+        self.browser_rss = 0
+
+    def sample(self):
+        now = time.monotonic()
+        if now - self.sampled_at >= MEMORY_SAMPLE_INTERVAL:
+            pid = os.getpid()
+            self.process_rss = rss_of(pid)
+            self.browser_rss = sum(rss_of(child) for child in child_pids(pid))
+            self.sampled_at = now
+        return self.process_rss, self.browser_rss
+
+    def snapshot(self):
+        process_rss, browser_rss = self.sample()
+        return {
+            "process_rss_mb": round(process_rss / MB, 1),
+            "browser_rss_mb": round(browser_rss / MB, 1),
+            "budget_mb": MEMORY_BUDGET_MB or None,
+            "browser_budget_mb": BROWSER_MEMORY_BUDGET_MB or None,
+        }
+
+sampler = MemorySampler()
+
+def has_budget(include_browser):
+    return bool(MEMORY_BUDGET_MB or (include_browser and BROWSER_MEMORY_BUDGET_MB))
+
+def over_budget(include_browser):
+    if not has_budget(include_browser):
+        # Nothing to enforce, so don't walk /proc for it
+        return None
+    process_rss, browser_rss = sampler.sample()
+    if BROWSER_MEMORY_BUDGET_MB and include_browser and browser_rss > BROWSER_MEMORY_BUDGET_MB * MB:
+        return f"browser RSS {browser_rss / MB:.0f} MB over budget"
+    total = process_rss + browser_rss
+    if MEMORY_BUDGET_MB and total > MEMORY_BUDGET_MB * MB:
+        return f"RSS {total / MB:.0f} MB over budget"
+    return None
+
+class LowMemoryError(HTTPException):
+    """Our own load shedding; retrying it only adds to the pressure."""
+
+    def __init__(self, reason):
+        super().__init__(
+            status_code=503,
+            detail=f"Server is low on memory ({reason}), try again later",
+            headers={"Retry-After": str(max(int(MEMORY_SAMPLE_INTERVAL * 5), 1))},
+        )
+
+def memory_admission(include_browser):
+    """Return a check that rejects new work while memory is over budget, or None without a budget."""
+    if not has_budget(include_browser):
+        return None
+    def check():
+        reason = over_budget(include_browser)
+        if reason:
+            logger.warning(f"Rejecting work: {reason}")
+            raise LowMemoryError(reason)
+    return check
+
+# Opt-in allocation profiling
+
+route_peaks = {}
+in_flight = 0
+last_snapshot = None
+
+def start_profiling():
+    if MEMORY_PROFILING and not tracemalloc.is_tracing():
+        tracemalloc.start(MEMORY_PROFILING_FRAMES)
+        logger.info("tracemalloc profiling enabled")
+
+@contextmanager
+def track_route(route):
+    """Record the traced-memory peak seen while a request for route runs.
+
+    With overlapping requests the peak is shared, so the figure is an upper bound.
+    """
+    global in_flight
+    if not tracemalloc.is_tracing():
+        yield
+        return
+    if in_flight == 0:
+        tracemalloc.reset_peak()
+    in_flight += 1
+    start = tracemalloc.get_traced_memory()[0]
+    try:
+        yield
+    finally:
+        in_flight -= 1
+        peak = tracemalloc.get_traced_memory()[1] - start
+        route_peaks[route] = max(route_peaks.get(route, 0), peak)
+
+def allocation_report(top=20, diff=False, group_by="lineno"):
+    global last_snapshot
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    if diff and last_snapshot is not None:
+        stats = snapshot.compare_to(last_snapshot, group_by)[:top]
+        sites = [{"site": str(stat.traceback), "size_kb": round(stat.size / 1024, 1),
+                  "size_diff_kb": round(stat.size_diff / 1024, 1), "count_diff": stat.count_diff} for stat in stats]
+    else:
+        stats = snapshot.statistics(group_by)[:top]
+        sites = [{"site": str(stat.traceback), "size_kb": round(stat.size / 1024, 1), "count": stat.count} for stat in stats]
+    last_snapshot = snapshot
+    current, peak = tracemalloc.get_traced_memory()
+    return {
+        "traced_mb": round(current / MB, 2),
+        "traced_peak_mb": round(peak / MB, 2),
+        "top_sites": sites,
+        "route_peaks_kb": {route: round(size / 1024, 1) for route, size in sorted(route_peaks.items())},
+    }
@@ -0,0 +1,43 @@
+import os
+import logging
+from fastapi import HTTPException
+from app.utils.cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+NEGATIVE_CACHE_SIZE = int(os.getenv("NEGATIVE_CACHE_SIZE", 10000))
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", 600))
+# An empty answer only means "gone" if the same route returned real data this recently
+NEGATIVE_CONFIRM_WINDOW = float(os.getenv("NEGATIVE_CONFIRM_WINDOW", 300))
+
+REASON_STATUSES = {"not_found": 404, "private": 403, "removed": 410}
+
+class TargetUnavailableError(HTTPException):
+    """The target itself is missing, private or removed; asking again won't help."""
+
+    def __init__(self, target, reason, cached=False):
+        super().__init__(
+            status_code=REASON_STATUSES.get(reason, 404),
+            detail=f"{target} is unavailable ({reason})",
+            headers={"X-Negative-Cache": "hit" if cached else "miss"},
+        )
+        self.target = target
+        self.reason = reason
+
+dead_targets = LRUCache(NEGATIVE_CACHE_SIZE, ttl=NEGATIVE_CACHE_TTL)
+stats = {"hits": 0, "stored": 0}
+
+def check_unavailable(target):
+    reason = dead_targets.get(target)
+    if reason is not None:
+        stats["hits"] += 1
+        raise TargetUnavailableError(target, reason, cached=True)
+
+def remember_unavailable(error):
+    if not error.headers or error.headers.get("X-Negative-Cache") != "hit":
+        logger.info(f"Caching {error.target} as {error.reason} for {NEGATIVE_CACHE_TTL:.0f}s")
+        dead_targets.set(error.target, error.reason)
+        stats["stored"] += 1
+
+def negative_cache_stats():
+    return {**stats, "entries": len(dead_targets), "ttl": NEGATIVE_CACHE_TTL}
@@ -1,10 +1,61 @@
-from playwright.async_api import async_playwright
+import os
 import asyncio
 import logging
 from contextlib import asynccontextmanager
+from app.utils.scheduler import browser_scheduler
+from app.utils.upstreams import UPSTREAM_OVERRIDES, upstream_url
+from app.utils.deadline import timeout_for
 
 logger = logging.getLogger(__name__)
 
+# Reuse one profile directory (and its HTTP disk cache) across contexts and restarts.
+# Chromium locks the directory, so each worker process needs its own.
+BROWSER_PROFILE_DIR = os.getenv("BROWSER_PROFILE_DIR")
+BROWSER_CACHE_MAX_MB = int(os.getenv("BROWSER_CACHE_MAX_MB", 512))
+
+class CacheStats:
+    def __init__(self):
+        self.responses = 0
+        self.hits = 0
+        self.network_bytes = 0
+
+    async def watch(self, context, page):
+        # Playwright doesn't say whether a response came from cache, so ask the DevTools protocol
+        session = await context.new_cdp_session(page)
+        cached = set()
+
+        def on_response(params):
+            self.responses += 1
+            response = params["response"]
+            if response.get("fromDiskCache") or response.get("fromPrefetchCache"):
+                cached.add(params["requestId"])
+
+        def on_served_from_cache(params):
+            cached.add(params["requestId"])
+
+        def on_finished(params):
+            if params["requestId"] in cached:
+                self.hits += 1
+                cached.discard(params["requestId"])
+            else:
+                self.network_bytes += params.get("encodedDataLength", 0)
+
+        session.on("Network.responseReceived", on_response)
+        session.on("Network.requestServedFromCache", on_served_from_cache)
+        session.on("Network.loadingFinished", on_finished)
+        await session.send("Network.enable")
+
+    def snapshot(self):
+        return {
+            "profile_dir": BROWSER_PROFILE_DIR,
+            "responses": self.responses,
+            "cache_hits": self.hits,
+            "hit_ratio": round(self.hits / self.responses, 3) if self.responses else None,
+            "network_mb": round(self.network_bytes / (1024 * 1024), 2),
+        }
+
+cache_stats = CacheStats()
+
 class PlaywrightManager:
     def __init__(self):
         self.playwright = None
@@ -14,16 +65,40 @@ class PlaywrightManager:
         self.last_used = 0
         self.close_task = None
 
+    @property
+    def is_running(self):
+        return self.context is not None
+
     async def initialize(self):
         async with self.lock:
             if self.playwright is None:
+                # Imported here so processes that never need a browser don't pay for it at startup
+                from playwright.async_api import async_playwright
                 self.playwright = await async_playwright().start()
-                self.browser = await self.playwright.chromium.launch(headless=True)
             if self.context is None:
-                self.context = await self.browser.new_context()
+                if BROWSER_PROFILE_DIR:
+                    self.context = await self.launch_persistent()
+                if self.context is None:
+                    if self.browser is None:
+                        self.browser = await self.playwright.chromium.launch(headless=True)
+                    self.context = await self.browser.new_context()
+                if UPSTREAM_OVERRIDES:
+                    await self.context.route("**/*", reroute_upstream)
             self.last_used = asyncio.get_event_loop().time()
             self.schedule_close()
 
+    async def launch_persistent(self):
+        try:
+            return await self.playwright.chromium.launch_persistent_context(
+                BROWSER_PROFILE_DIR,
+                headless=True,
+                args=[f"--disk-cache-size={BROWSER_CACHE_MAX_MB * 1024 * 1024}"],
+            )
+        except Exception as e:
+            # Usually another process holds the profile lock; run with a throwaway context instead
+            logger.error(f"Could not open browser profile {BROWSER_PROFILE_DIR}, using an ephemeral context: {str(e)}")
+            return None
+
     def schedule_close(self):
         if self.close_task:
             self.close_task.cancel()
@@ -48,12 +123,28 @@ class PlaywrightManager:
 
     @asynccontextmanager
     async def get_page(self):
-        await self.initialize()
-        page = await self.context.new_page()
-        try:
-            yield page
-        finally:
-            await page.close()
+        # Pages are handed out by the fair scheduler so bulk jobs can't starve interactive calls
+        async with browser_scheduler.slot():
+            await self.initialize()
+            page = await self.context.new_page()
+            if BROWSER_PROFILE_DIR:
+                try:
+                    await cache_stats.watch(self.context, page)
+                except Exception as e:
+                    logger.debug(f"Cache stats unavailable: {str(e)}")
+            try:
+                yield page
+            finally:
+                await page.close()
+
+async def reroute_upstream(route):
+    # Serve overridden hosts from their replacement while the page keeps the original URL
+    target = upstream_url(route.request.url)
+    if target == route.request.url:
+        await route.continue_()
+        return
+    response = await route.fetch(url=target, max_redirects=0)
+    await route.fulfill(response=response)
 
 playwright_manager = PlaywrightManager()
 
@@ -63,7 +154,8 @@ async def get_page():
 # Helper function for common page operations
 async def navigate_and_wait(page, url, timeout=30000):
     try:
-        await page.goto(url, timeout=timeout, wait_until="networkidle")
+        # Never wait past the request deadline
+        await page.goto(url, timeout=timeout_for(timeout / 1000) * 1000, wait_until="networkidle")
     except Exception as e:
         logger.error(f"Navigation error: {str(e)}")
-        raise
\ No newline at end of file
+        raise
@@ -0,0 +1,25 @@
+import contextvars
+
+# Per-request scratch space shared between the HTTP middleware and the code it calls.
+# The middleware installs a fresh dict; deeper layers add flags the response should carry.
+request_state = contextvars.ContextVar("request_state", default=None)
+
+# Where the item fetched last in this task came from. Bulk workers run one task per
+# item (or one item at a time), so they read it right after each fetch.
+item_source = contextvars.ContextVar("item_source", default=None)
+
+def get_request_state():
+    state = request_state.get()
+    return state if state is not None else {}
+
+def mark_stale(reason):
+    item_source.set("stale")
+    state = request_state.get()
+    if state is not None:
+        state["stale"] = reason
+
+def mark_source(source):
+    item_source.set(source)
+    state = request_state.get()
+    if state is not None:
+        state.setdefault("sources", set()).add(source)
@@ -0,0 +1,170 @@
+import os
+import json
+import random
+import asyncio
+import logging
+import aiohttp
+import contextvars
+from collections import Counter
+from fastapi import HTTPException
+from app.utils.hedging import HedgeBudget
+from app.utils.circuit_breaker import BlockedError, CircuitOpenError
+from app.utils.request_context import get_request_state
+from app.utils.deadline import DeadlineExceeded, check_deadline, remaining
+from app.utils.memory import LowMemoryError
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.5))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 10))
+# Every first attempt earns this fraction of a retry, so retries add at most ~20% load per service
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", 0.2))
+RETRY_BUDGET_BURST = float(os.getenv("RETRY_BUDGET_BURST", 20))
+# Retries one request, bulk item or watch refresh may spend across all the services it calls
+RETRY_REQUEST_BUDGET = int(os.getenv("RETRY_REQUEST_BUDGET", 4))
+
+RETRYABLE_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+
+RETRYABLE = "retryable"
+FATAL = "fatal"
+BLOCKED = "blocked"
+
+def error_status(error):
+    if isinstance(error, HTTPException):
+        return error.status_code
+    response = getattr(error, "response", None)
+    if response is not None and getattr(response, "status_code", None) is not None:
+        return response.status_code
+    status = getattr(error, "status", None)
+    return status if isinstance(status, int) else None
+
+def classify(error):
+    """Return (kind, reason) for an exception raised by an attempt."""
+    if isinstance(error, DeadlineExceeded):
+        return FATAL, "deadline"
+    if isinstance(error, CircuitOpenError):
+        return FATAL, "circuit_open"
+    if isinstance(error, LowMemoryError):
+        return FATAL, "low_memory"
+    if isinstance(error, BlockedError):
+        return BLOCKED, f"blocked_{error.reason}"
+    status = error_status(error)
+    if status is not None:
+        if status in RETRYABLE_STATUSES or status >= 500:
+            return RETRYABLE, f"status_{status}"
+        return FATAL, f"status_{status}"
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError)) or "Timeout" in type(error).__name__:
+        return RETRYABLE, "timeout"
+    if isinstance(error, (ConnectionError, aiohttp.ClientConnectionError)):
+        return RETRYABLE, "connection"
+    if isinstance(error, json.JSONDecodeError):
+        return RETRYABLE, "invalid_json"
+    # Browser and parsing errors are usually a flaky page load
+    return RETRYABLE, type(error).__name__
+
+class RetryStats:
+    def __init__(self):
+        self.budget = HedgeBudget(RETRY_BUDGET_RATIO, RETRY_BUDGET_BURST)
+        self.stats = {"calls": 0, "attempts": 0, "retries": 0, "fatal": 0, "exhausted": 0, "budget_exhausted": 0, "deadline": 0}
+        self.reasons = Counter()
+
+    def snapshot(self):
+        return {**self.stats, "reasons": dict(self.reasons), "budget_tokens": round(self.budget.tokens, 2)}
+
+services = {}
+
+def get_retry_stats(service):
+    if service not in services:
+        services[service] = RetryStats()
+    return services[service]
+
+def retry_stats():
+    return {service: stats.snapshot() for service, stats in services.items()}
+
+# Retries spent by the current unit of work when it isn't the whole request
+retry_scope = contextvars.ContextVar("retry_scope", default=None)
+
+def start_retry_scope():
+    """Give the current task its own retry budget, e.g. one bulk item or one watch refresh."""
+    retry_scope.set({})
+
+def take_request_retry():
+    state = retry_scope.get()
+    if state is None:
+        state = get_request_state()
+    used = state.get("retries", 0)
+    if used >= RETRY_REQUEST_BUDGET:
+        return False
+    state["retries"] = used + 1
+    return True
+
+def retry_after(error):
+    """Seconds the upstream asked us to wait before trying again, if it said."""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(error, "headers", None) or {}
+        value = headers.get("Retry-After")
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        # Missing, or the rarely used HTTP-date form
+        return None
+
+def backoff(attempt, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+    # Full jitter: spread retries over the whole window so callers don't retry in lockstep
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+class RetryPolicy:
+    def __init__(self, service, max_attempts=3, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY, retry_blocked=False):
+        self.service = service
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # False: a block is final. True: retry after a backoff, honouring Retry-After.
+        # A check(n) callable: retry at once when attempt n goes out through a route not tried yet,
+        # otherwise the block is final, since the same route would only be hit again.
+        self.retry_blocked = retry_blocked
+
+    async def run(self, attempt):
+        """Call attempt(n) until it succeeds or the error, attempt count or budgets say stop."""
+        stats = get_retry_stats(self.service)
+        stats.stats["calls"] += 1
+        stats.budget.deposit()
+        for n in range(self.max_attempts):
+            check_deadline()
+            stats.stats["attempts"] += 1
+            try:
+                return await attempt(n)
+            except Exception as error:
+                kind, reason = classify(error)
+                new_route = kind == BLOCKED and callable(self.retry_blocked) and self.retry_blocked(n + 1)
+                if kind == FATAL or (kind == BLOCKED and not new_route and self.retry_blocked is not True):
+                    stats.stats["fatal"] += 1
+                    raise
+                if n == self.max_attempts - 1:
+                    stats.stats["exhausted"] += 1
+                    raise
+                if new_route:
+                    # The next attempt goes elsewhere, so there is nothing to wait for
+                    delay = 0
+                else:
+                    delay = backoff(n, self.base_delay, self.max_delay)
+                    asked = retry_after(error)
+                    if asked is not None:
+                        if asked > self.max_delay:
+                            # The upstream wants a longer pause than this call is willing to wait
+                            stats.stats["fatal"] += 1
+                            raise
+                        delay = max(delay, asked)
+                if not take_request_retry() or not stats.budget.withdraw():
+                    stats.stats["budget_exhausted"] += 1
+                    raise
+                stats.stats["retries"] += 1
+                stats.reasons[reason] += 1
+                left = remaining()
+                if left is not None and delay >= left:
+                    # The answer would arrive after the client stopped waiting
+                    stats.stats["deadline"] += 1
+                    raise DeadlineExceeded() from error
+                logger.warning(f"{self.service} attempt {n + 1} failed ({reason}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
@@ -0,0 +1,165 @@
+import os
+import heapq
+import asyncio
+import itertools
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from app.utils.request_context import get_request_state
+from app.utils.memory import memory_admission
+from app.utils.deadline import within_deadline
+
+logger = logging.getLogger(__name__)
+
+BROWSER_CONCURRENCY = int(os.getenv("BROWSER_CONCURRENCY", 4))
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSTREAM_CONCURRENCY", 32))
+
+def parse_shares(value):
+    shares = {}
+    for item in value.split(","):
+        name, _, share = item.partition(":")
+        if name.strip() and share.strip():
+            shares[name.strip()] = float(share)
+    return shares
+
+# Relative share of capacity per priority class and per tenant, e.g. "acme:4,crawler:1"
+PRIORITY_SHARES = parse_shares(os.getenv("PRIORITY_SHARES", "interactive:9,batch:1"))
+TENANT_SHARES = parse_shares(os.getenv("TENANT_SHARES", ""))
+DEFAULT_PRIORITY = "interactive"
+# Every tenant not named in TENANT_SHARES shares this one flow
+DEFAULT_TENANT = "default"
+
+def parse_api_keys(value):
+    keys = {}
+    for item in value.split(","):
+        key, _, tenant = item.rpartition(":")
+        if key.strip() and tenant.strip():
+            keys[key.strip()] = tenant.strip()
+    return keys
+
+# Which tenant an X-API-Key belongs to, e.g. "sk-live-abc:acme". Keys are never used as labels.
+TENANT_API_KEYS = parse_api_keys(os.getenv("TENANT_API_KEYS", ""))
+
+def resolve_tenant(tenant_header=None, api_key=None):
+    """Map request headers onto a configured tenant name, or the shared default flow."""
+    if api_key and api_key in TENANT_API_KEYS:
+        return TENANT_API_KEYS[api_key]
+    return tenant_header if tenant_header in TENANT_SHARES else DEFAULT_TENANT
+
+def resolve_priority(requested, default):
+    # Clients may lower their priority but never raise it above the default for the endpoint
+    if requested in PRIORITY_SHARES and PRIORITY_SHARES[requested] <= PRIORITY_SHARES.get(default, 1.0):
+        return requested
+    return default
+
+class QueueTimes:
+    def __init__(self, window=500):
+        self.samples = deque(maxlen=window)
+        self.waiting = 0
+
+    def snapshot(self):
+        ordered = sorted(self.samples)
+        def pick(p):
+            return round(ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)], 4) if ordered else None
+        return {"waiting": self.waiting, "p50": pick(50), "p95": pick(95), "max": pick(100)}
+
+class FairScheduler:
+    """Hands out a fixed number of slots using weighted fair queuing.
+
+    Every (priority, tenant) pair is a flow whose weight is the product of its
+    priority and tenant shares. Waiters are served in order of virtual finish
+    time, so a flow with twice the weight gets twice the slots under contention,
+    and any flow may use all the capacity nobody else is asking for.
+    """
+
+    def __init__(self, name, capacity, admission=None):
+        self.name = name
+        self.capacity = capacity
+        # Called before queueing; raises to turn the request away
+        self.admission = admission
+        self.in_use = 0
+        self.waiters = []  # heap of (finish_tag, seq, future)
+        self.virtual_time = 0.0
+        self.last_finish = {}
+        self.sequence = itertools.count()
+        self.queue_times = {}
+
+    def weight(self, priority, tenant):
+        return PRIORITY_SHARES.get(priority, 1.0) * TENANT_SHARES.get(tenant, 1.0)
+
+    def stats_for(self, label):
+        if label not in self.queue_times:
+            self.queue_times[label] = QueueTimes()
+        return self.queue_times[label]
+
+    async def acquire(self, priority, tenant):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        trackers = (self.stats_for(f"priority:{priority}"), self.stats_for(f"tenant:{tenant}"))
+
+        # Drop waiters that gave up so they don't hold back the fast path
+        while self.waiters and self.waiters[0][2].done():
+            heapq.heappop(self.waiters)
+
+        if self.in_use < self.capacity and not self.waiters:
+            self.in_use += 1
+        else:
+            flow = (priority, tenant)
+            finish = max(self.virtual_time, self.last_finish.get(flow, 0.0)) + 1.0 / self.weight(priority, tenant)
+            self.last_finish[flow] = finish
+            future = loop.create_future()
+            heapq.heappush(self.waiters, (finish, next(self.sequence), future))
+            for tracker in trackers:
+                tracker.waiting += 1
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just as we were cancelled
+                    self.release()
+                raise
+            finally:
+                for tracker in trackers:
+                    tracker.waiting -= 1
+
+        waited = loop.time() - started
+        for tracker in trackers:
+            tracker.samples.append(waited)
+
+    def release(self):
+        self.in_use -= 1
+        while self.waiters and self.in_use < self.capacity:
+            finish, _, future = heapq.heappop(self.waiters)
+            if future.done():
+                continue
+            self.in_use += 1
+            self.virtual_time = finish
+            future.set_result(None)
+
+    @asynccontextmanager
+    async def slot(self, priority=None, tenant=None):
+        state = get_request_state()
+        priority = priority or state.get("priority", DEFAULT_PRIORITY)
+        tenant = tenant or state.get("tenant", DEFAULT_TENANT)
+        if self.admission:
+            self.admission()
+        # Stop queueing once the request can no longer be answered in time
+        await within_deadline(self.acquire(priority, tenant))
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self):
+        return {
+            "capacity": self.capacity,
+            "in_use": self.in_use,
+            "queued": sum(1 for _, _, future in self.waiters if not future.done()),
+            "queue_time": {label: times.snapshot() for label, times in self.queue_times.items()},
+        }
+
+browser_scheduler = FairScheduler("browser", BROWSER_CONCURRENCY, admission=memory_admission(include_browser=True))
+upstream_scheduler = FairScheduler("upstream", UPSTREAM_CONCURRENCY, admission=memory_admission(include_browser=False))
+
+def scheduler_stats():
+    return {scheduler.name: scheduler.snapshot() for scheduler in (browser_scheduler, upstream_scheduler)}
@@ -0,0 +1,98 @@
+import os
+import re
+import asyncio
+import logging
+import multiprocessing
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Batches at least this large go to the process pool instead of running on the event loop
+TEXT_ANALYTICS_POOL_THRESHOLD = int(os.getenv("TEXT_ANALYTICS_POOL_THRESHOLD", 2000))
+TEXT_ANALYTICS_CHUNK_SIZE = int(os.getenv("TEXT_ANALYTICS_CHUNK_SIZE", 1000))
+TEXT_ANALYTICS_WORKERS = int(os.getenv("TEXT_ANALYTICS_WORKERS", max((os.cpu_count() or 2) - 1, 1)))
+
+EMOJI = (
+    "\U0001F000-\U0001FAFF"
+    "\u2300-\u23FF"
+    "\u2600-\u27BF"
+    "\u2B00-\u2BFF"
+)
+# Variation selector, keycap and skin tones belong to the emoji before them
+EMOJI_MODIFIERS = "\ufe0f\u20e3\U0001F3FB-\U0001F3FF"
+# A flag is a pair of regional indicator letters
+FLAG = "[\U0001F1E6-\U0001F1FF]{2}"
+
+# One alternation so each text is scanned once. URLs come first so "#fragment" and
+# "@user" inside a link aren't counted as tags.
+TOKEN_PATTERN = re.compile(
+    r"(?P<url>https?://[^\s]+|www\.[^\s]+)"
+    r"|(?P<hashtag>#\w+)"
+    r"|(?P<mention>@\w+)"
+    rf"|(?P<emoji>{FLAG}|[{EMOJI}](?:[{EMOJI_MODIFIERS}]|\u200d[{EMOJI}])*)"
+)
+
+TextStats = namedtuple("TextStats", ["hashtags", "mentions", "urls", "emoji"])
+
+EMPTY = TextStats([], [], [], {})
+
+def analyze_text(text):
+    if not text:
+        return EMPTY
+    hashtags, mentions, urls, emoji = [], [], [], {}
+    for match in TOKEN_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == "hashtag":
+            hashtags.append(match.group())
+        elif kind == "mention":
+            mentions.append(match.group())
+        elif kind == "url":
+            urls.append(match.group())
+        else:
+            token = match.group()
+            emoji[token] = emoji.get(token, 0) + 1
+    return TextStats(hashtags, mentions, urls, emoji)
+
+def analyze_texts(texts):
+    return [analyze_text(text) for text in texts]
+
+pool = None
+
+def get_pool():
+    global pool
+    if pool is None:
+        # Forked workers would inherit the event loop, open sockets and Playwright's threads; spawn starts clean
+        pool = ProcessPoolExecutor(max_workers=TEXT_ANALYTICS_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return pool
+
+def close_pool():
+    global pool
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+        pool = None
+
+async def analyze_batch(texts):
+    """Analyze many texts, in worker processes when the batch is big enough to stall the loop."""
+    texts = list(texts)
+    if len(texts) < TEXT_ANALYTICS_POOL_THRESHOLD:
+        return analyze_texts(texts)
+    loop = asyncio.get_running_loop()
+    executor = get_pool()
+    chunks = [texts[start:start + TEXT_ANALYTICS_CHUNK_SIZE] for start in range(0, len(texts), TEXT_ANALYTICS_CHUNK_SIZE)]
+    results = await asyncio.gather(*(loop.run_in_executor(executor, analyze_texts, chunk) for chunk in chunks))
+    return [stats for chunk in results for stats in chunk]
+
+def summarize(results):
+    hashtags, mentions, urls, emoji = Counter(), Counter(), Counter(), Counter()
+    for stats in results:
+        hashtags.update(stats.hashtags)
+        mentions.update(stats.mentions)
+        urls.update(stats.urls)
+        emoji.update(stats.emoji)
+    return {
+        "hashtags": dict(hashtags.most_common()),
+        "mentions": dict(mentions.most_common()),
+        "urls": dict(urls.most_common()),
+        "emoji": dict(emoji.most_common()),
+    }
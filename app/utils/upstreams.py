@@ -0,0 +1,27 @@
+import os
+from urllib.parse import urlsplit
+
+def parse_overrides(value):
+    overrides = {}
+    for item in value.split(","):
+        host, _, base = item.partition("=")
+        if host.strip() and base.strip():
+            overrides[host.strip().lower()] = base.strip().rstrip("/")
+    return overrides
+
+# Send traffic for a host somewhere else, e.g. to the load-test stand-in:
+# UPSTREAM_OVERRIDES="www.instagram.com=http://127.0.0.1:9100,www.tiktok.com=http://127.0.0.1:9100"
+UPSTREAM_OVERRIDES = parse_overrides(os.getenv("UPSTREAM_OVERRIDES", ""))
+
+def upstream_url(url):
+    """Return the URL to actually fetch for url, honouring UPSTREAM_OVERRIDES."""
+    if not UPSTREAM_OVERRIDES:
+        return url
+    parts = urlsplit(url)
+    base = UPSTREAM_OVERRIDES.get((parts.hostname or "").lower())
+    if base is None:
+        return url
+    rewritten = base + (parts.path or "/")
+    if parts.query:
+        rewritten += "?" + parts.query
+    return rewritten
@@ -0,0 +1,112 @@
+import os
+import re
+import logging
+from collections import namedtuple
+from urllib.parse import urljoin
+from app.utils.cache import LRUCache
+from app.utils.http_session import get_session, request_timeout
+from app.utils.upstreams import upstream_url
+
+logger = logging.getLogger(__name__)
+
+SHORT_LINK_CACHE_SIZE = int(os.getenv("SHORT_LINK_CACHE_SIZE", 10000))
+MAX_REDIRECTS = 5
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# platform: "instagram" | "tiktok"
+# kind: "post", "reel", "share", "profile" (Instagram) or "video", "photo", "short", "profile" (TikTok)
+UrlInfo = namedtuple("UrlInfo", ["platform", "kind", "id", "username"])
+
+URL_PATTERN = re.compile(r"""
+    ^(?:https?://)?(?:(?:www|m)\.)?
+    (?:
+        (?:instagram\.com|instagr\.am)/
+        (?:
+            share/(?:(?:p|reels?)/)?(?P<ig_share>[\w-]+)
+          | (?:(?P<ig_owner>[\w.]+)/)?(?P<ig_kind>p|reels?|tv)/(?P<ig_id>[\w-]+)
+          | (?P<ig_user>[\w.]+)/?(?:[?#]|$)
+        )
+      | (?:vm|vt)\.tiktok\.com/(?P<tt_short>\w+)
+      | tiktok\.com/
+        (?:
+            @(?P<tt_user>[\w.-]*)(?:/(?P<tt_kind>video|photo)/(?P<tt_id>\d+))?
+          | t/(?P<tt_t>\w+)
+          | v/(?P<tt_v>\d+)
+        )
+    )
+""", re.VERBOSE | re.IGNORECASE)
+
+# Top-level Instagram paths that look like usernames but aren't profiles
+INSTAGRAM_RESERVED_PATHS = {
+    "p", "reel", "reels", "tv", "share", "explore", "accounts", "stories", "direct", "about", "developer", "legal", "web",
+}
+
+INSTAGRAM_KINDS = {"p": "post", "tv": "post", "reel": "reel", "reels": "reel"}
+
+resolved_links = LRUCache(SHORT_LINK_CACHE_SIZE)
+
+def classify_url(url):
+    """Classify an Instagram or TikTok URL without touching the network.
+
+    Returns a UrlInfo, or None when the URL isn't recognised.
+    """
+    match = URL_PATTERN.match(url.strip())
+    if not match:
+        return None
+    groups = match.groupdict()
+
+    if groups["ig_share"]:
+        return UrlInfo("instagram", "share", groups["ig_share"], None)
+    if groups["ig_id"]:
+        return UrlInfo("instagram", INSTAGRAM_KINDS[groups["ig_kind"].lower()], groups["ig_id"], groups["ig_owner"])
+    if groups["ig_user"]:
+        if groups["ig_user"].lower() in INSTAGRAM_RESERVED_PATHS:
+            return None
+        return UrlInfo("instagram", "profile", groups["ig_user"], groups["ig_user"])
+
+    if groups["tt_id"]:
+        # The username may be left out (tiktok.com/@/video/<id>), TikTok still serves the item
+        return UrlInfo("tiktok", groups["tt_kind"].lower(), groups["tt_id"], groups["tt_user"] or None)
+    if groups["tt_user"]:
+        return UrlInfo("tiktok", "profile", groups["tt_user"], groups["tt_user"])
+    if groups["tt_v"]:
+        return UrlInfo("tiktok", "video", groups["tt_v"], None)
+    short_code = groups["tt_short"] or groups["tt_t"]
+    if not short_code:
+        return None
+    return UrlInfo("tiktok", "short", short_code, None)
+
+def needs_resolution(info):
+    return info is not None and info.kind in ("share", "short")
+
+async def resolve_short_link(url):
+    """Follow share/short link redirects over plain HTTP.
+
+    Returns the first URL that classifies as a concrete post, or None if it
+    couldn't be resolved without a browser.
+    """
+    cached = resolved_links.get(url)
+    if cached:
+        return cached
+
+    session = get_session("redirects")
+    current = url
+    for _ in range(MAX_REDIRECTS):
+        try:
+            async with session.get(upstream_url(current), headers={"User-Agent": USER_AGENT}, allow_redirects=False, timeout=request_timeout()) as response:
+                location = response.headers.get("Location")
+        except Exception as e:
+            logger.warning(f"Failed to resolve {url} over HTTP: {str(e)}")
+            return None
+        if not location:
+            break
+        current = urljoin(current, location)
+        info = classify_url(current)
+        if info and not needs_resolution(info) and info.kind != "profile":
+            logger.info(f"Resolved {url} to {current}")
+            resolved_links.set(url, current)
+            return current
+
+    logger.info(f"Could not resolve {url} without a browser")
+    return None
@@ -1,7 +1,8 @@
 # utils.py
 
-from playwright.async_api import async_playwright
+import os
 import re
+from app.utils.url_classifier import classify_url
 
 playwright = None
 browser_type = None
@@ -40,13 +41,19 @@ async def extract_shortcode(url):
         await context.close()
 
 def extract_username_tiktok(url):
-    match = re.search(r'tiktok\.com/@([a-zA-Z0-9_.-]+)', url)
-    return match.group(1) if match else None
+    info = classify_url(url)
+    return info.username if info and info.platform == "tiktok" else None
 
 def extract_content_id(url):
-    patterns = [r'video/(\d+)', r'photo/(\d+)', r'/v/(\d+)', r'/(\d+)(?:\?|$)']
-    for pattern in patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
-    return None
\ No newline at end of file
+    info = classify_url(url)
+    if info and info.platform == "tiktok" and info.kind in ("video", "photo"):
+        return info.id
+    return None
+
+def get_proxy_list():
+    proxy_list = [
+        os.getenv('PROXY', ''),
+        os.getenv('PROXY_2', ''),
+        os.getenv('PROXY_3', '')
+    ]
+    return [proxy for proxy in proxy_list if proxy]
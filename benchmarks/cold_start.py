@@ -0,0 +1,80 @@
+"""Cold start benchmark.
+
+Measures, in fresh interpreters:
+  * import time of ``app.main`` (what every replica pays before serving)
+  * time from process spawn until ``/health`` answers, per BROWSER_STARTUP mode
+
+Usage:
+    python benchmarks/cold_start.py [--runs 5] [--modes lazy,background,eager]
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import app.main; "
+    "print(time.perf_counter() - t)"
+)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def measure_import():
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+def measure_first_response(mode, timeout=60):
+    port = free_port()
+    env = dict(os.environ, BROWSER_STARTUP=mode)
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                return None
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        return None
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def summarize(label, samples):
+    samples = [s for s in samples if s is not None]
+    if not samples:
+        print(f"{label:<32} failed")
+        return
+    print(f"{label:<32} median {statistics.median(samples) * 1000:8.1f} ms   "
+          f"min {min(samples) * 1000:8.1f} ms   max {max(samples) * 1000:8.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", default="lazy,background,eager")
+    args = parser.parse_args()
+
+    summarize("import app.main", [measure_import() for _ in range(args.runs)])
+    for mode in args.modes.split(","):
+        summarize(f"first /health ({mode})", [measure_first_response(mode) for _ in range(args.runs)])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Load driver: runs the real FastAPI app against the local stand-in.
+
+Starts loadtest/stand_in.py and uvicorn (app.main:app) with UPSTREAM_OVERRIDES
+pointing at it, then drives each scenario at each concurrency level and reports
+throughput and latency percentiles.
+
+    python loadtest/driver.py --scenarios profile,post_compact,post_all --concurrency 1,8,32 --duration 10
+
+Scenarios that go through Chromium (tiktok_short, tiktok_video) need
+`playwright install chromium`; everything else is HTTP-only.
+"""
+import os
+import sys
+import time
+import json
+import socket
+import asyncio
+import argparse
+import itertools
+import subprocess
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from loadtest.stand_in import stand_in_overrides  # noqa: E402
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def scenario_request(name, n):
+    """Return (method, path, json_body) for request number n of a scenario."""
+    shortcode = f"SC{n % 5000:05d}"
+    if name == "profile":
+        return "GET", f"/scrape-instagram-profile?username=user{n % 5000}", None
+    if name in ("post_compact", "post_all", "post_raw", "post_statistics"):
+        response_type = {"post_compact": "compact", "post_all": "all", "post_raw": "raw", "post_statistics": "statistics"}[name]
+        return "GET", f"/scrape-instagram-post?url=https://www.instagram.com/p/{shortcode}/&responseType={response_type}", None
+    if name == "post_share":
+        return "GET", f"/scrape-instagram-post?url=https://www.instagram.com/share/{shortcode}&responseType=compact", None
+    if name == "bulk_statistics":
+        return "POST", "/scrape-instagram-posts/statistics", {"shortcodes": [f"B{n}x{i}" for i in range(50)]}
+    if name == "tiktok_bulk":
+        return "POST", "/scrape-tiktok/bulk", {"ids": [str(7300000000000000000 + n * 50 + i) for i in range(50)]}
+    if name == "tiktok_short":
+        return "GET", f"/scrape-tiktok?url=https://vm.tiktok.com/ZM{n % 5000}/", None
+    if name == "tiktok_video":
+        return "GET", f"/scrape-tiktok?url=https://www.tiktok.com/@standin/video/{7300000000000000000 + n % 5000}", None
+    if name == "media":
+        return "GET", f"/media/instagram?shortcode={shortcode}", None
+    raise ValueError(f"Unknown scenario {name}")
+
+def percentile(ordered, p):
+    if not ordered:
+        return float("nan")
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+async def run_level(base_url, scenario, concurrency, duration):
+    counter = itertools.count()
+    latencies = []
+    statuses = {}
+    deadline = time.perf_counter() + duration
+    timeout = aiohttp.ClientTimeout(total=120)
+
+    async with aiohttp.ClientSession(base_url, timeout=timeout) as session:
+        async def worker():
+            while time.perf_counter() < deadline:
+                method, path, body = scenario_request(scenario, next(counter))
+                started = time.perf_counter()
+                try:
+                    async with session.request(method, path, json=body) as response:
+                        await response.read()
+                        status = response.status
+                except Exception as e:
+                    status = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "statuses": statuses,
+    }
+
+def wait_for(url, timeout=30):
+    import urllib.request
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"{url} did not come up")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scenarios", default="profile,post_compact,post_all,post_statistics,bulk_statistics,tiktok_bulk")
+    parser.add_argument("--concurrency", default="1,8,32")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per scenario and level")
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args()
+
+    stand_in_port, app_port = free_port(), free_port()
+    stand_in_url = f"http://127.0.0.1:{stand_in_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    stand_in = subprocess.Popen([
+        sys.executable, os.path.join(ROOT, "loadtest", "stand_in.py"), "--port", str(stand_in_port),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate), "--rate-limit", str(args.rate_limit),
+    ], stdout=subprocess.DEVNULL)
+    env = dict(
+        os.environ,
+        UPSTREAM_OVERRIDES=stand_in_overrides(stand_in_url),
+        BROWSER_STARTUP=os.getenv("BROWSER_STARTUP", "lazy"),
+        INSTAGRAM_DOC_ID=os.getenv("INSTAGRAM_DOC_ID", "0"),
+        X_IG_APP_ID=os.getenv("X_IG_APP_ID", "0"),
+        PROXY="", PROXY_2="", PROXY_3="",
+    )
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(app_port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    results = []
+    try:
+        wait_for(f"{stand_in_url}/_stats")
+        wait_for(f"{app_url}/health")
+        print(f"{'scenario':<18}{'conc':>6}{'reqs':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}  statuses")
+        for scenario in args.scenarios.split(","):
+            for concurrency in (int(c) for c in args.concurrency.split(",")):
+                result = asyncio.run(run_level(app_url, scenario, concurrency, args.duration))
+                results.append(result)
+                print(f"{scenario:<18}{concurrency:>6}{result['requests']:>8}{result['throughput']:>10.1f}"
+                      f"{result['p50_ms']:>10.1f}{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}  {result['statuses']}")
+    finally:
+        app.terminate()
+        stand_in.terminate()
+        app.wait()
+        stand_in.wait()
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
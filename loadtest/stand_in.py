@@ -0,0 +1,192 @@
+"""Local stand-in for the Instagram and TikTok endpoints the service calls.
+
+Replays the recorded responses in loadtest/fixtures with configurable latency,
+error rate and 429 behaviour, so the service can be load-tested without network.
+
+    python loadtest/stand_in.py --port 9100 --latency-ms 80 --jitter-ms 40 --error-rate 0.01 --rate-limit 500
+
+Point the service at it with UPSTREAM_OVERRIDES (see stand_in_overrides()).
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import argparse
+from urllib.parse import parse_qs
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# Hosts the service talks to; short-link hosts get their own path prefix
+STAND_IN_HOSTS = {
+    "www.instagram.com": "",
+    "i.instagram.com": "",
+    "www.tiktok.com": "",
+    "vm.tiktok.com": "/_short",
+    "vt.tiktok.com": "/_short",
+    "scontent.cdninstagram.com": "/_cdn",
+    "v16-webapp.tiktok.com": "/_cdn",
+}
+
+TIKTOK_PAGE = """<!DOCTYPE html><html><head><title>TikTok</title></head><body>
+<script id="__UNIVERSAL_DATA_FOR_REHYDRATION__" type="application/json">{data}</script>
+<script>fetch("/api/item/detail/?itemId={item_id}")</script>
+</body></html>"""
+
+INSTAGRAM_EMBED_PAGE = """<!DOCTYPE html><html><head><title>Instagram</title></head><body>
+<div class="Embed"><span class="UsernameText">standin</span>
+<img class="EmbeddedMediaImage" alt="" src="https://scontent.cdninstagram.com/standin.jpg"></div>
+<script>window.__s.handle({{"contextJSON":{context}}});</script>
+</body></html>"""
+
+def embed_variant(post):
+    # The embed page carries the same media under gql_data, with the like counter named differently
+    media = json.loads(compact(post))["data"]["xdt_shortcode_media"]
+    media["edge_liked_by"] = media.pop("edge_media_preview_like", {"count": 0})
+    return INSTAGRAM_EMBED_PAGE.format(context=json.dumps(compact({"context": {}, "gql_data": {"shortcode_media": media}})))
+
+def stand_in_overrides(base_url):
+    return ",".join(f"{host}={base_url}{prefix}" for host, prefix in STAND_IN_HOSTS.items())
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as file:
+        return json.load(file)
+
+def compact(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+def statistics_variant(post):
+    # What GraphQL returns when asked for zero comments and likers
+    media = json.loads(compact(post))["data"]["xdt_shortcode_media"]
+    for edge in ("edge_media_to_parent_comment", "edge_media_preview_like", "edge_media_preview_comment"):
+        media.get(edge, {})["edges"] = []
+    return {"data": {"xdt_shortcode_media": media}, "extensions": {"is_final": True}, "status": "ok"}
+
+def numeric_id(code):
+    # Stable TikTok-looking id for a short code
+    return str(7300000000000000000 + sum(ord(c) * 131 ** i for i, c in enumerate(code)) % 10 ** 17)
+
+class Behaviour:
+    def __init__(self, latency_ms, jitter_ms, error_rate, rate_limit):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.tokens = rate_limit
+        self.refilled_at = time.monotonic()
+        self.counts = {}
+
+    def take_token(self):
+        if not self.rate_limit:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.rate_limit, self.tokens + (now - self.refilled_at) * self.rate_limit)
+        self.refilled_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def count(self, key):
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+def build_app(behaviour):
+    post = compact(load_fixture("graphql_post.json"))
+    post_statistics = compact(statistics_variant(load_fixture("graphql_post.json")))
+    embed = embed_variant(load_fixture("graphql_post.json"))
+    profile = compact(load_fixture("web_profile_info.json"))
+    reflow = compact(load_fixture("reflow_item.json"))
+    item = compact({"__DEFAULT_SCOPE__": {"webapp.video-detail": {
+        "statusCode": 0, "itemInfo": load_fixture("reflow_item.json")["itemInfo"]}}})
+    media_bytes = os.urandom(256 * 1024)
+
+    @web.middleware
+    async def simulate(request, handler):
+        if request.path == "/_stats":
+            return await handler(request)
+        delay = behaviour.latency + random.uniform(-behaviour.jitter, behaviour.jitter)
+        await asyncio.sleep(max(delay, 0))
+        if not behaviour.take_token():
+            behaviour.count("429")
+            return web.json_response({"message": "Please wait a few minutes before you try again.", "status": "fail"},
+                                     status=429, headers={"Retry-After": "1"})
+        if random.random() < behaviour.error_rate:
+            behaviour.count("500")
+            return web.Response(status=500, text="stand-in error")
+        behaviour.count(request.path.split("/")[1] or "root")
+        return await handler(request)
+
+    async def web_profile_info(request):
+        username = request.query.get("username", "standin")
+        return web.Response(text=profile.replace("USERNAME", username), content_type="application/json")
+
+    async def graphql_query(request):
+        form = parse_qs(await request.text())
+        variables = json.loads(form.get("variables", ["{}"])[0])
+        shortcode = variables.get("shortcode", "SHORTCODE")
+        body = post_statistics if variables.get("parent_comment_count") == 0 else post
+        return web.Response(text=body.replace("SHORTCODE", shortcode), content_type="application/json")
+
+    async def instagram_embed(request):
+        return web.Response(text=embed.replace("SHORTCODE", request.match_info["shortcode"]), content_type="text/html")
+
+    async def reflow_item(request):
+        item_id = request.query.get("item_id") or request.query.get("itemId", "0")
+        return web.Response(text=reflow.replace("ITEM_ID", item_id), content_type="application/json")
+
+    async def tiktok_page(request):
+        item_id = request.match_info["item_id"]
+        page = TIKTOK_PAGE.format(data=item.replace("ITEM_ID", item_id), item_id=item_id)
+        return web.Response(text=page, content_type="text/html")
+
+    async def short_link(request):
+        code = request.match_info["code"]
+        raise web.HTTPMovedPermanently(f"https://www.tiktok.com/@standin/video/{numeric_id(code)}?_r=1")
+
+    async def instagram_share(request):
+        raise web.HTTPFound(f"https://www.instagram.com/p/{request.match_info['token']}/")
+
+    async def cdn(request):
+        return web.Response(body=media_bytes, content_type="video/mp4" if request.path.endswith(".mp4") else "image/jpeg")
+
+    async def stats(request):
+        return web.json_response(behaviour.counts)
+
+    app = web.Application(middlewares=[simulate])
+    app.router.add_get("/api/v1/users/web_profile_info", web_profile_info)
+    app.router.add_get("/api/v1/users/web_profile_info/", web_profile_info)
+    app.router.add_post("/graphql/query/", graphql_query)
+    app.router.add_post("/graphql/query", graphql_query)
+    app.router.add_get("/p/{shortcode}/embed/captioned/", instagram_embed)
+    app.router.add_get("/api/reflow/item/detail", reflow_item)
+    app.router.add_get("/api/item/detail/", reflow_item)
+    app.router.add_get(r"/@{user}/{kind:video|photo}/{item_id:\d+}", tiktok_page)
+    app.router.add_get("/t/{code}", short_link)
+    app.router.add_get("/t/{code}/", short_link)
+    app.router.add_get("/_short/{code}", short_link)
+    app.router.add_get("/_short/{code}/", short_link)
+    app.router.add_get("/share/{token}", instagram_share)
+    app.router.add_get("/share/{token}/", instagram_share)
+    app.router.add_get("/share/{kind:p|reel}/{token}", instagram_share)
+    app.router.add_get("/share/{kind:p|reel}/{token}/", instagram_share)
+    app.router.add_get("/_cdn/{path:.*}", cdn)
+    app.router.add_get("/_stats", stats)
+    return app
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--jitter-ms", type=float, default=40)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0, help="requests/s before answering 429 (0 = unlimited)")
+    args = parser.parse_args()
+
+    behaviour = Behaviour(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit)
+    print(f"UPSTREAM_OVERRIDES={stand_in_overrides(f'http://{args.host}:{args.port}')}")
+    web.run_app(build_app(behaviour), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+import pytest
+from app.utils import circuit_breaker, hedging, negative_cache, retry
+
+@pytest.fixture(autouse=True)
+def reset_upstream_state():
+    """Breakers, caches and budgets are module-level; give every test a clean slate."""
+    yield
+    circuit_breaker.breakers.clear()
+    circuit_breaker.last_good.entries.clear()
+    negative_cache.dead_targets.entries.clear()
+    hedging.hedgers.clear()
+    retry.services.clear()
@@ -0,0 +1,57 @@
+import asyncio
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils import admission
+from app.utils.admission import AdaptiveLimiter, limiters
+
+def test_full_queue_sheds_with_retry_after(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_QUEUE_FACTOR", 0)
+
+    async def run():
+        limiter = AdaptiveLimiter("http", initial=1, minimum=1, maximum=4)
+        assert await limiter.acquire() is None
+        rejection = await limiter.acquire()
+        limiter.release(0.1)
+        return limiter, rejection
+
+    limiter, rejection = asyncio.run(run())
+    assert rejection.status_code == 503
+    assert int(rejection.headers["Retry-After"]) >= 1
+    assert limiter.stats["shed"] == 1
+
+def test_queued_request_is_admitted_when_a_slot_frees():
+    async def run():
+        limiter = AdaptiveLimiter("http", initial=1, minimum=1, maximum=4)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        assert len(limiter.waiters) == 1
+        limiter.release(0.1)
+        return await waiter, limiter
+
+    admitted, limiter = asyncio.run(run())
+    assert admitted is None
+    assert limiter.in_flight == 1
+
+def test_queue_timeout_sheds(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_QUEUE_TIMEOUT", 0.05)
+
+    async def run():
+        limiter = AdaptiveLimiter("http", initial=1, minimum=1, maximum=4)
+        await limiter.acquire()
+        return await limiter.acquire(), limiter
+
+    rejection, limiter = asyncio.run(run())
+    assert rejection.status_code == 503
+    assert not limiter.waiters
+
+def test_overloaded_route_answers_503_and_exempt_paths_still_work(monkeypatch):
+    monkeypatch.setattr(admission, "ADMISSION_QUEUE_FACTOR", 0)
+    monkeypatch.setitem(limiters, "http", AdaptiveLimiter("http", initial=1, minimum=1, maximum=1))
+    limiters["http"].in_flight = 1
+    client = TestClient(app)
+
+    response = client.get("/scrape-instagram-post?url=https://www.instagram.com/p/ABC123/")
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert client.get("/health").status_code == 200
@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from app.utils import circuit_breaker
+from app.utils.circuit_breaker import (
+    BlockedError, CircuitOpenError, acquire_breaker, available_routes, get_breaker, guarded, remember, stale_or_raise,
+)
+from app.utils.negative_cache import TargetUnavailableError
+
+def open_breaker(upstream, route=None):
+    breaker = get_breaker(upstream, route)
+    for _ in range(circuit_breaker.BREAKER_THRESHOLD):
+        breaker.record_block("login_wall")
+    return breaker
+
+def test_breaker_opens_after_threshold_blocks():
+    breaker = get_breaker("upstream")
+    for _ in range(circuit_breaker.BREAKER_THRESHOLD - 1):
+        breaker.record_block("login_wall")
+    assert breaker.state == "closed"
+    breaker.record_block("login_wall")
+    assert breaker.state == "open"
+    assert not breaker.is_available()
+
+def test_available_routes_skips_open_routes_and_fails_fast_when_none_left():
+    open_breaker("upstream", "proxy-a")
+    assert available_routes("upstream", ["proxy-a", None]) == [None]
+
+    open_breaker("upstream")
+    with pytest.raises(CircuitOpenError) as error:
+        available_routes("upstream", ["proxy-a", None])
+    assert error.value.status_code == 503
+    assert int(error.value.headers["Retry-After"]) >= 1
+
+def test_half_open_lets_a_single_probe_through(monkeypatch):
+    breaker = open_breaker("upstream")
+    monkeypatch.setattr(circuit_breaker, "BREAKER_RESET_TIMEOUT", 0)
+
+    assert acquire_breaker("upstream") is breaker
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpenError):
+        acquire_breaker("upstream")
+
+    breaker.release()
+    assert breaker.is_available()
+
+def test_blocked_probe_reopens_and_successful_probe_closes(monkeypatch):
+    breaker = open_breaker("upstream")
+    monkeypatch.setattr(circuit_breaker, "BREAKER_RESET_TIMEOUT", 0)
+    acquire_breaker("upstream")
+    breaker.record_block("captcha")
+    assert breaker.state == "open"
+
+    acquire_breaker("upstream")
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.blocks == 0
+
+def run_guarded(error=None):
+    async def attempt(route):
+        if error:
+            raise error
+        return "data"
+    return asyncio.run(guarded("upstream", attempt)(None))
+
+def test_guarded_feeds_outcomes_into_the_breaker():
+    breaker = get_breaker("upstream")
+    assert run_guarded() == "data"
+    assert breaker.recently_healthy(60)
+
+    for _ in range(circuit_breaker.BREAKER_THRESHOLD):
+        with pytest.raises(BlockedError):
+            run_guarded(BlockedError("upstream", "login_wall"))
+    assert breaker.state == "open"
+
+def test_guarded_probe_that_finds_a_dead_target_closes_the_circuit(monkeypatch):
+    breaker = open_breaker("upstream")
+    monkeypatch.setattr(circuit_breaker, "BREAKER_RESET_TIMEOUT", 0)
+    assert breaker.is_available()
+
+    with pytest.raises(TargetUnavailableError):
+        run_guarded(TargetUnavailableError("instagram_post:abc", "not_found"))
+
+    assert breaker.state == "closed"
+    assert not breaker.probing
+    # A missing post is not evidence that the route serves real data
+    assert breaker.last_success is None
+
+def test_guarded_releases_the_probe_on_other_errors(monkeypatch):
+    breaker = open_breaker("upstream")
+    monkeypatch.setattr(circuit_breaker, "BREAKER_RESET_TIMEOUT", 0)
+    breaker.is_available()
+
+    with pytest.raises(asyncio.TimeoutError):
+        run_guarded(asyncio.TimeoutError())
+
+    assert breaker.state == "half_open"
+    assert breaker.is_available()
+
+def test_stale_answer_is_served_only_when_remembered():
+    error = CircuitOpenError("upstream", 30)
+    with pytest.raises(CircuitOpenError):
+        stale_or_raise("post:abc", error)
+    remember("post:abc", {"id": "1"})
+    assert stale_or_raise("post:abc", error) == {"id": "1"}
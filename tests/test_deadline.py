@@ -0,0 +1,48 @@
+import asyncio
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app.utils.deadline import DeadlineExceeded, DeadlineMiddleware, remaining, timeout_for
+
+def client():
+    app = FastAPI()
+    app.add_middleware(DeadlineMiddleware)
+    cancelled = []
+
+    @app.get("/slow")
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return {"done": True}
+
+    @app.get("/left")
+    async def left():
+        return {"remaining": remaining(), "timeout": timeout_for(10)}
+
+    return TestClient(app), cancelled
+
+def test_request_past_its_deadline_gets_504_and_its_work_is_cancelled():
+    test_client, cancelled = client()
+
+    response = test_client.get("/slow", headers={"X-Request-Timeout": "0.2"})
+
+    assert response.status_code == 504
+    assert response.json() == {"detail": "Request deadline exceeded."}
+    assert cancelled == [True]
+
+def test_handlers_see_what_is_left_of_the_deadline():
+    test_client, _ = client()
+
+    body = test_client.get("/left?timeout=2").json()
+
+    assert 0 < body["remaining"] <= 2
+    assert body["timeout"] <= 2
+
+def test_timeout_for_fails_once_the_deadline_passed(monkeypatch):
+    monkeypatch.setattr("app.utils.deadline.remaining", lambda: -1)
+    with pytest.raises(DeadlineExceeded) as error:
+        timeout_for(10)
+    assert error.value.status_code == 504
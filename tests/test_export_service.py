@@ -0,0 +1,61 @@
+import os
+import asyncio
+import pyarrow.parquet
+from app.services import export_service
+from app.services.export_service import ColumnarExport, active_exports, sweep_exports
+
+def owner(original_id, username):
+    return {"original_id": original_id, "username": username}
+
+def test_owners_without_id_are_kept_and_manifest_paths_are_relative(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_DIR", str(tmp_path))
+    export = ColumnarExport("parquet", "compact")
+
+    async def write():
+        await export.write_rows("a", [("owners", owner("1", "first"))])
+        await export.write_rows("b", [("owners", owner("1", "first"))])
+        await export.write_rows("c", [("owners", owner(None, "hidden"))])
+        await export.write_rows("d", [("owners", owner(None, "also_hidden"))])
+        await export.close()
+
+    asyncio.run(write())
+
+    manifest = export.manifest()
+    path = manifest["tables"]["owners"]["path"]
+    assert path == os.path.join(export.id, "owners.parquet")
+    assert manifest["tables"]["owners"]["rows"] == 3
+    usernames = pyarrow.parquet.read_table(tmp_path / path).column("username").to_pylist()
+    assert usernames == ["first", "hidden", "also_hidden"]
+
+def make_export(root, name, age, now):
+    path = root / name
+    path.mkdir()
+    os.utime(path, (now - age, now - age))
+
+def test_sweep_removes_expired_and_surplus_exports(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(export_service, "EXPORT_TTL", 100)
+    monkeypatch.setattr(export_service, "EXPORT_MAX_COUNT", 2)
+    now = 10000
+    newest, newer, older, expired, running = ("%032x" % n for n in range(5))
+    make_export(tmp_path, newest, 1, now)
+    make_export(tmp_path, newer, 2, now)
+    make_export(tmp_path, older, 3, now)
+    make_export(tmp_path, expired, 500, now)
+    make_export(tmp_path, running, 1000, now)
+    (tmp_path / "not-an-export").mkdir()
+    active_exports.add(running)
+    try:
+        assert sweep_exports(now) == 2
+    finally:
+        active_exports.discard(running)
+
+    assert sorted(os.listdir(tmp_path)) == sorted([newest, newer, running, "not-an-export"])
+
+def test_sweep_limits_can_be_disabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_service, "EXPORT_DIR", str(tmp_path))
+    monkeypatch.setattr(export_service, "EXPORT_TTL", 0)
+    monkeypatch.setattr(export_service, "EXPORT_MAX_COUNT", 0)
+    make_export(tmp_path, "%032x" % 1, 10 ** 6, 10 ** 7)
+
+    assert sweep_exports(10 ** 7) == 0
@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from app.services import instagram_service
+from app.services.instagram_service import (
+    COMPACT_PROJECTION, EMBED_COMMENTS, EMBED_LIKES, compact_model, embed_count, embed_markup_media, fetch_post_data,
+)
+from app.utils import retry, upstreams
+from app.utils.http_session import close_sessions
+from app.utils.request_context import item_source
+from loadtest.stand_in import compact, embed_variant, load_fixture
+
+POST = compact(load_fixture("graphql_post.json"))
+EMBED_PAGE = embed_variant(load_fixture("graphql_post.json"))
+
+def fetch_from(monkeypatch, graphql_body, **kwargs):
+    """Run fetch_post_data against a local server standing in for www.instagram.com."""
+    requests = []
+
+    async def graphql(request):
+        requests.append("graphql")
+        return web.Response(text=graphql_body, content_type="application/json")
+
+    async def embed(request):
+        requests.append("embed")
+        return web.Response(text=EMBED_PAGE.replace("SHORTCODE", request.match_info["shortcode"]), content_type="text/html")
+
+    app = web.Application()
+    app.router.add_post("/graphql/query/", graphql)
+    app.router.add_get("/p/{shortcode}/embed/captioned/", embed)
+    monkeypatch.setattr(retry, "backoff", lambda *args: 0)
+    monkeypatch.setattr(instagram_service, "get_proxy_list", lambda: [])
+
+    async def run():
+        async with TestServer(app) as server:
+            monkeypatch.setattr(upstreams, "UPSTREAM_OVERRIDES", {"www.instagram.com": str(server.make_url("")).rstrip("/")})
+            try:
+                data = await fetch_post_data("ABC123", **kwargs)
+                return data, item_source.get(), requests
+            finally:
+                await close_sessions()
+
+    return asyncio.run(run())
+
+def test_projected_graphql_fetch(monkeypatch):
+    data, source, requests = fetch_from(monkeypatch, POST.replace("SHORTCODE", "ABC123"), statistics_only=True, projection=COMPACT_PROJECTION)
+
+    assert source == "graphql"
+    assert requests == ["graphql"]
+    assert data["data"]["xdt_shortcode_media"]["id"] == "3100000000000000000"
+
+def test_truncated_graphql_body_falls_back_to_the_embed_page(monkeypatch):
+    data, source, requests = fetch_from(monkeypatch, POST[:len(POST) // 2], statistics_only=True, projection=COMPACT_PROJECTION)
+
+    assert source == "embed"
+    assert requests[-1] == "embed" and requests.count("graphql") >= 1
+    assert data["data"]["xdt_shortcode_media"]["id"] == "3100000000000000000"
+
+@pytest.mark.parametrize("text, count", [
+    ("987 likes", 987),
+    ("1 like", 1),
+    ("1,234 likes", 1234),
+    ("1.234.567 likes", 1234567),
+    ("15K likes", 15000),
+    ("1.2M likes", 1200000),
+    ("12,5K likes", 12500),
+    ("1.5 likes", None),
+    ("1,234.567 likes", None),
+    ("no counter here", 0),
+])
+def test_embed_like_count(text, count):
+    assert embed_count(EMBED_LIKES, text) == count
+
+def test_embed_comment_count():
+    assert embed_count(EMBED_COMMENTS, "View all 3.4K comments") == 3400
+
+def test_markup_counts_feed_the_compact_model():
+    html = ('<span class="UsernameText">standin</span>'
+            '<img class="EmbeddedMediaImage" alt="" src="https://scontent.cdninstagram.com/x.jpg">'
+            '<div>1.2M likes</div><a>View all 1.5 comments</a>')
+    media = embed_markup_media(html, "ABC123")
+    data = compact_model(media, "https://www.instagram.com/p/ABC123/")
+
+    assert data.post.statistics.like_count == 1200000
+    assert data.post.statistics.comment_count is None
+    assert data.engagement_count == 1200000
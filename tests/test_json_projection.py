@@ -0,0 +1,55 @@
+import json
+import asyncio
+import pytest
+from app.services.instagram_service import COMPACT_PROJECTION, MEDIA_PROJECTION, STATISTICS_PROJECTION, compact_model
+from app.utils.json_projection import parse_projected, read_head
+from loadtest.stand_in import compact, load_fixture
+
+BODY = compact(load_fixture("graphql_post.json")).encode()
+
+async def pieces(body, size):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+def parse(body, projection, size=7):
+    async def run():
+        chunks = pieces(body, size)
+        return await parse_projected(await read_head(chunks, 64), chunks, projection)
+    return asyncio.run(run())
+
+def pick(value, path):
+    """Every value at a dotted ijson path, with ".item" stepping into arrays."""
+    values = [value]
+    for part in path.split("."):
+        if part == "item":
+            values = [item for value in values for item in value]
+        else:
+            values = [value[part] for value in values if isinstance(value, dict) and part in value]
+    return values
+
+@pytest.mark.parametrize("projection", [COMPACT_PROJECTION, MEDIA_PROJECTION, STATISTICS_PROJECTION], ids=lambda p: p.name)
+def test_projected_parse_matches_full_parse(projection):
+    full = json.loads(BODY)
+    projected = parse(BODY, projection)
+
+    for path in projection.paths:
+        assert pick(projected, path) == pick(full, path), path
+    # Nothing outside the projection is built
+    assert "edge_media_to_tagged_user" not in projected["data"]["xdt_shortcode_media"]
+
+def test_compact_model_is_the_same_from_either_parse():
+    url = "https://www.instagram.com/p/SHORTCODE/"
+    full = json.loads(BODY)["data"]["xdt_shortcode_media"]
+    projected = parse(BODY, COMPACT_PROJECTION)["data"]["xdt_shortcode_media"]
+
+    expected, actual = compact_model(full, url).to_dict(), compact_model(projected, url).to_dict()
+    for model in (expected, actual):
+        # Stamped with the time the model was built
+        model.pop("created_at")
+        model.pop("updated_at")
+    assert actual == expected
+
+@pytest.mark.parametrize("body", [BODY[:len(BODY) // 2], b'{"data": {"xdt_shortcode_media": nope}}'], ids=["truncated", "malformed"])
+def test_bad_body_raises_json_decode_error(body):
+    with pytest.raises(json.JSONDecodeError):
+        parse(body, COMPACT_PROJECTION)
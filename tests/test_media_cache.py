@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from app.services import media_service
+from app.utils.media_cache import MediaCache
+
+def write_part(cache, key, size):
+    path = cache.temp_path(key)
+    with open(path, "wb") as file:
+        file.write(b"x" * size)
+    return path
+
+def test_commit_evicts_least_recently_used(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=10)
+    cache.commit("a", write_part(cache, "a", 4), "image/jpeg")
+    cache.commit("b", write_part(cache, "b", 4), "image/jpeg")
+    assert cache.get("a")
+    cache.commit("c", write_part(cache, "c", 4), "image/jpeg")
+
+    assert set(cache.entries) == {"a", "c"}
+    assert cache.total_bytes == 8
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.jpg", "c.jpg"]
+
+def test_commit_drops_files_larger_than_the_cache(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=10)
+    cache.commit("big", write_part(cache, "big", 11), "video/mp4")
+    assert not cache.entries
+    assert not list(tmp_path.iterdir())
+
+def test_get_forgets_files_removed_behind_its_back(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=10)
+    cache.commit("a", write_part(cache, "a", 4), "image/jpeg")
+    (tmp_path / "a.jpg").unlink()
+    assert cache.get("a") is None
+    assert cache.total_bytes == 0
+
+def test_load_removes_partial_downloads(tmp_path):
+    (tmp_path / "a.123.456.part").write_bytes(b"x")
+    (tmp_path / "b.jpg").write_bytes(b"xy")
+    cache = MediaCache(str(tmp_path), max_bytes=10)
+    assert list(cache.entries) == ["b"]
+    assert not (tmp_path / "a.123.456.part").exists()
+
+def test_cache_hit_is_looked_up_off_the_event_loop(tmp_path, monkeypatch):
+    cache = MediaCache(str(tmp_path), max_bytes=100)
+    cache.commit("instagram_abc_0", write_part(cache, "instagram_abc_0", 5), "image/jpeg")
+    threads = []
+    get = cache.get
+
+    def recording_get(key):
+        threads.append(threading.current_thread())
+        return get(key)
+
+    monkeypatch.setattr(cache, "get", recording_get)
+    monkeypatch.setattr(media_service, "media_cache", cache)
+
+    status, headers, body, cleanup = asyncio.run(media_service.stream_media("instagram", "abc", 0, "bytes=1-2"))
+
+    assert threads and threads[0] is not threading.main_thread()
+    assert status == 206
+    assert headers["Content-Range"] == "bytes 1-2/5"
+    assert b"".join(body) == b"xx"
+    assert cleanup is None
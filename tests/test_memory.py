@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.utils import memory
+from app.utils.memory import LowMemoryError, memory_admission, over_budget
+
+def test_no_budget_means_no_check_and_no_sampling(monkeypatch):
+    monkeypatch.setattr(memory, "MEMORY_BUDGET_MB", 0)
+    monkeypatch.setattr(memory, "BROWSER_MEMORY_BUDGET_MB", 0)
+    monkeypatch.setattr(memory, "child_pids", lambda root: pytest.fail("walked /proc without a budget"))
+    monkeypatch.setattr(memory.sampler, "sampled_at", 0)
+
+    assert memory_admission(include_browser=True) is None
+    assert over_budget(include_browser=True) is None
+
+def test_browser_budget_only_applies_to_browser_work(monkeypatch):
+    monkeypatch.setattr(memory, "MEMORY_BUDGET_MB", 0)
+    monkeypatch.setattr(memory, "BROWSER_MEMORY_BUDGET_MB", 100)
+    monkeypatch.setattr(memory.sampler, "sample", lambda: (10 * memory.MB, 200 * memory.MB))
+
+    assert memory_admission(include_browser=False) is None
+    check = memory_admission(include_browser=True)
+    with pytest.raises(LowMemoryError) as error:
+        check()
+    assert error.value.status_code == 503
+    assert "Retry-After" in error.value.headers
+
+def test_debug_memory_bounds_top(monkeypatch):
+    monkeypatch.setattr(memory.tracemalloc, "is_tracing", lambda: True)
+    seen = []
+    monkeypatch.setattr("app.routes.system_routes.allocation_report", lambda top, diff, group_by: seen.append(top) or {})
+    client = TestClient(app)
+
+    assert client.get("/debug/memory").status_code == 200
+    assert client.get("/debug/memory?top=100").status_code == 200
+    assert client.get("/debug/memory?top=0").status_code == 422
+    assert client.get("/debug/memory?top=1000000").status_code == 422
+    assert seen == [10, 100]
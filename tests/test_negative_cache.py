@@ -0,0 +1,29 @@
+import time
+import pytest
+from app.utils import negative_cache
+from app.utils.negative_cache import TargetUnavailableError, check_unavailable, dead_targets, remember_unavailable
+
+def advance(monkeypatch, seconds):
+    now = time.monotonic() + seconds
+    monkeypatch.setattr("app.utils.cache.time.monotonic", lambda: now)
+
+def test_cached_target_is_answered_until_the_ttl_runs_out(monkeypatch):
+    remember_unavailable(TargetUnavailableError("instagram_post:abc", "private"))
+
+    with pytest.raises(TargetUnavailableError) as error:
+        check_unavailable("instagram_post:abc")
+    assert error.value.status_code == 403
+    assert error.value.headers["X-Negative-Cache"] == "hit"
+
+    advance(monkeypatch, negative_cache.NEGATIVE_CACHE_TTL + 1)
+    check_unavailable("instagram_post:abc")
+    assert len(dead_targets) == 0
+
+def test_cache_hits_are_not_stored_again():
+    remember_unavailable(TargetUnavailableError("instagram_post:abc", "not_found"))
+    stored = negative_cache.stats["stored"]
+    with pytest.raises(TargetUnavailableError) as error:
+        check_unavailable("instagram_post:abc")
+
+    remember_unavailable(error.value)
+    assert negative_cache.stats["stored"] == stored
@@ -0,0 +1,100 @@
+import json
+import asyncio
+import aiohttp
+import pytest
+from fastapi import HTTPException
+from app.utils import retry
+from app.utils.retry import BLOCKED, FATAL, RETRYABLE, RetryPolicy, classify, get_retry_stats
+from app.utils.circuit_breaker import BlockedError, CircuitOpenError, get_breaker, untried_route
+from app.utils.deadline import DeadlineExceeded
+from app.utils.memory import LowMemoryError
+
+@pytest.mark.parametrize("error, kind", [
+    (DeadlineExceeded(), FATAL),
+    (CircuitOpenError("upstream", 30), FATAL),
+    (LowMemoryError("RSS over budget"), FATAL),
+    (BlockedError("upstream", "login_wall"), BLOCKED),
+    (HTTPException(status_code=404), FATAL),
+    (HTTPException(status_code=429), RETRYABLE),
+    (HTTPException(status_code=502), RETRYABLE),
+    (asyncio.TimeoutError(), RETRYABLE),
+    (aiohttp.ClientConnectionError(), RETRYABLE),
+    (json.JSONDecodeError("Expecting value", "", 0), RETRYABLE),
+])
+def test_classify(error, kind):
+    assert classify(error)[0] == kind
+
+class Attempts:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    async def __call__(self, n):
+        self.calls.append(n)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+
+    async def sleep(delay):
+        slept.append(delay)
+
+    monkeypatch.setattr(retry.asyncio, "sleep", sleep)
+    monkeypatch.setattr(retry, "take_request_retry", lambda: True)
+    return slept
+
+def run(policy, attempts):
+    return asyncio.run(policy.run(attempts))
+
+def test_retryable_errors_back_off_and_fatal_errors_stop(sleeps):
+    attempts = Attempts(asyncio.TimeoutError(), "ok")
+    assert run(RetryPolicy("svc", 3, base_delay=0.01), attempts) == "ok"
+    assert attempts.calls == [0, 1] and len(sleeps) == 1
+
+    attempts = Attempts(HTTPException(status_code=404), "ok")
+    with pytest.raises(HTTPException):
+        run(RetryPolicy("svc", 3), attempts)
+    assert attempts.calls == [0]
+    assert get_retry_stats("svc").stats["fatal"] == 1
+
+def test_blocks_are_final_by_default(sleeps):
+    attempts = Attempts(BlockedError("upstream", "login_wall"), "ok")
+    with pytest.raises(BlockedError):
+        run(RetryPolicy("svc", 3), attempts)
+    assert attempts.calls == [0]
+
+def test_block_is_retried_at_once_only_on_an_untried_route(sleeps):
+    check = untried_route("upstream", [None, "http://proxy"])
+    attempts = Attempts(BlockedError("upstream", "login_wall"), BlockedError("upstream", "login_wall"), "ok")
+    with pytest.raises(BlockedError):
+        run(RetryPolicy("svc", 3, retry_blocked=check), attempts)
+    # Both routes were tried, without waiting; the third attempt would have reused the first route
+    assert attempts.calls == [0, 1]
+    assert sleeps == [0]
+
+def test_block_with_a_single_route_is_final(sleeps):
+    check = untried_route("upstream", [None])
+    attempts = Attempts(BlockedError("upstream", "status_429"), "ok")
+    with pytest.raises(BlockedError):
+        run(RetryPolicy("svc", 3, retry_blocked=check), attempts)
+    assert attempts.calls == [0]
+    assert not sleeps
+
+def test_open_routes_are_not_counted_as_untried(sleeps):
+    breaker = get_breaker("upstream", "http://proxy")
+    breaker.state, breaker.opened_at = "open", float("inf")
+    assert not untried_route("upstream", [None, "http://proxy"])(1)
+
+def test_same_route_retry_honours_retry_after(sleeps):
+    attempts = Attempts(BlockedError("upstream", "status_429", "3"), "ok")
+    assert run(RetryPolicy("svc", 3, base_delay=0.01, max_delay=5, retry_blocked=True), attempts) == "ok"
+    assert sleeps == [3]
+
+    attempts = Attempts(BlockedError("upstream", "status_429", "60"), "ok")
+    with pytest.raises(BlockedError):
+        run(RetryPolicy("svc", 3, max_delay=5, retry_blocked=True), attempts)
+    assert attempts.calls == [0]
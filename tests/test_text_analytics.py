@@ -0,0 +1,26 @@
+import asyncio
+from app.utils import text_analytics
+from app.utils.text_analytics import analyze_batch, analyze_text, close_pool, get_pool
+
+def test_tokens_are_classified_once():
+    stats = analyze_text("#launch with @team at https://example.com/#launch 🚀🚀")
+    assert stats.hashtags == ["#launch"]
+    assert stats.mentions == ["@team"]
+    assert stats.urls == ["https://example.com/#launch"]
+    assert stats.emoji == {"🚀": 2}
+
+def test_flags_and_modified_emoji_count_as_one():
+    stats = analyze_text("🇮🇩🇯🇵 👍🏽 👩‍💻 🇮🇩")
+    assert stats.emoji == {"🇮🇩": 2, "🇯🇵": 1, "👍🏽": 1, "👩‍💻": 1}
+
+def test_large_batches_run_in_spawned_workers(monkeypatch):
+    monkeypatch.setattr(text_analytics, "TEXT_ANALYTICS_POOL_THRESHOLD", 2)
+    monkeypatch.setattr(text_analytics, "TEXT_ANALYTICS_CHUNK_SIZE", 2)
+    monkeypatch.setattr(text_analytics, "TEXT_ANALYTICS_WORKERS", 1)
+    try:
+        assert get_pool()._mp_context.get_start_method() == "spawn"
+        results = asyncio.run(analyze_batch(["#a", "@b", "🇮🇩"]))
+    finally:
+        close_pool()
+    assert [stats.hashtags for stats in results] == [["#a"], [], []]
+    assert results[2].emoji == {"🇮🇩": 1}
@@ -0,0 +1,40 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.routes import tiktok_routes
+from app.services import tiktok_service
+from app.utils.url_classifier import classify_url
+
+def test_classify_url_accepts_an_empty_username():
+    info = classify_url("https://www.tiktok.com/@/video/7300000000000000001")
+    assert (info.platform, info.kind, info.id, info.username) == ("tiktok", "video", "7300000000000000001", None)
+
+def test_classify_url_rejects_a_bare_at_sign():
+    assert classify_url("https://www.tiktok.com/@") is None
+
+def test_scrape_tiktok_serves_links_without_a_username(monkeypatch):
+    fetched = []
+
+    async def fake_playwright(url):
+        fetched.append(url)
+        return {"id": "7300000000000000001"}
+
+    monkeypatch.setattr(tiktok_service, "load_tokens", lambda: ("ms-token", "x-bogus", None))
+    monkeypatch.setattr(tiktok_routes, "get_tiktok_playwright", fake_playwright)
+
+    url = "https://www.tiktok.com/@/video/7300000000000000001"
+    response = TestClient(app).get("/scrape-tiktok", params={"url": url})
+
+    assert response.status_code == 200
+    assert response.json() == {"id": "7300000000000000001"}
+    assert fetched == [url]
+
+def test_scrape_tiktok_still_needs_a_content_id(monkeypatch):
+    async def fake_resolve(url):
+        return "https://www.tiktok.com/@someone"
+
+    monkeypatch.setattr(tiktok_service, "load_tokens", lambda: ("ms-token", "x-bogus", None))
+    monkeypatch.setattr(tiktok_service, "get_original_tiktok_link", fake_resolve)
+
+    response = TestClient(app).get("/scrape-tiktok", params={"url": "https://vm.tiktok.com/ZMabc/"})
+
+    assert response.status_code == 400
@@ -0,0 +1,42 @@
+import asyncio
+from app.services import watch_service
+from app.services.watch_service import Watcher
+from app.utils.circuit_breaker import CircuitOpenError, remember, stale_or_raise
+
+def refresh_with(monkeypatch, fetcher):
+    watcher = Watcher()
+    target = watcher.add("instagram_post", "abc", 3600)
+    monkeypatch.setitem(watch_service.FETCHERS, "instagram_post", fetcher)
+    asyncio.run(watcher.refresh(target))
+    return watcher, target
+
+def test_fresh_statistics_are_recorded_as_a_change(monkeypatch):
+    async def fetch(shortcode):
+        return {"likes": 5}
+
+    watcher, target = refresh_with(monkeypatch, fetch)
+
+    assert target.statistics == {"likes": 5}
+    assert [change["statistics"] for change in watcher.changes] == [{"likes": 5}]
+
+def test_stale_answer_does_not_count_as_a_change(monkeypatch):
+    remember("instagram_post:abc", {"likes": 3})
+
+    async def fetch(shortcode):
+        # What a fetcher does when the circuit is open and an old answer is on hand
+        return stale_or_raise("instagram_post:abc", CircuitOpenError("instagram", 30))
+
+    emitted = []
+
+    async def emit(self, change):
+        emitted.append(change)
+
+    monkeypatch.setattr(watch_service, "WATCH_WEBHOOK_URL", "http://hook.invalid")
+    monkeypatch.setattr(Watcher, "emit", emit)
+    watcher, target = refresh_with(monkeypatch, fetch)
+
+    assert target.statistics is None
+    assert target.changed_at is None
+    assert not watcher.changes
+    assert not emitted
+    assert target.checked_at is not None